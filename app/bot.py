@@ -0,0 +1,17 @@
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from app import settings
+from app.outbox import RateLimitMiddleware
+from app.ratelimit import GLOBAL_RATE, ChatRateLimiter
+from config import TOKEN
+
+
+def create_bot(global_rate: float = GLOBAL_RATE) -> Bot:
+    if settings.BOT_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(settings.BOT_API_URL))
+    else:
+        session = AiohttpSession()
+    session.middleware(RateLimitMiddleware(ChatRateLimiter(global_rate=global_rate)))
+    return Bot(token=TOKEN, session=session)
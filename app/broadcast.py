@@ -0,0 +1,80 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+import app.db as bd
+
+CONCURRENCY = 10
+MAX_ATTEMPTS = 3
+
+
+@dataclass
+class BroadcastStats:
+    sent: int = 0
+    blocked: int = 0
+    failed: int = 0
+
+
+class Broadcaster:
+    """Sends one message to every reachable player.
+
+    Sends run ``concurrency`` at a time; flood limits and ``retry_after`` are handled
+    by the bot's RateLimitMiddleware. Players are streamed from the database in id
+    order and the last finished page is saved under ``job``, so an interrupted run
+    resumes there. Players who blocked the bot are excluded from later broadcasts.
+    """
+
+    def __init__(self, bot: Bot, job: str, concurrency: int = CONCURRENCY):
+        self.bot = bot
+        self.job = job
+        self.concurrency = concurrency
+        self.stats = BroadcastStats()
+
+    async def send(self, chat_id: int, text: str) -> None:
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                await self.bot.send_message(chat_id, text)
+                self.stats.sent += 1
+                return
+            except TelegramForbiddenError:
+                logging.info(f"User {chat_id} blocked the bot, removing from broadcasts")
+                await bd.mark_blocked(chat_id)
+                self.stats.blocked += 1
+                return
+            except TelegramBadRequest as e:
+                if 'chat not found' in e.message.lower():
+                    await bd.mark_blocked(chat_id)
+                    self.stats.blocked += 1
+                else:
+                    logging.error(f"Failed to send message to {chat_id}: {e}")
+                    self.stats.failed += 1
+                return
+            except Exception as e:
+                logging.error(f"Failed to send message to {chat_id} (attempt {attempt}): {e}")
+                await asyncio.sleep(attempt)
+        self.stats.failed += 1
+
+    async def run(self, text: str) -> BroadcastStats:
+        after, finished = await bd.get_broadcast_cursor(self.job)
+        if finished:
+            logging.info(f"Broadcast {self.job} already finished")
+            return self.stats
+        if after:
+            logging.info(f"Resuming broadcast {self.job} after player {after}")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send_bounded(chat_id: int):
+            async with semaphore:
+                await self.send(chat_id, text)
+
+        async for player_ids in bd.iter_player_ids(after):
+            await asyncio.gather(*(send_bounded(player_id) for player_id in player_ids))
+            after = player_ids[-1]
+            await bd.save_broadcast_cursor(self.job, after)
+        await bd.save_broadcast_cursor(self.job, after, finished=True)
+        logging.info(f"Broadcast {self.job} done: {self.stats}")
+        return self.stats
@@ -0,0 +1,222 @@
+import asyncio
+import heapq
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+import app.db as bd
+import app.oxford_api as ox
+from app import engine
+from app.game_state import DAILY, GameState
+from app.leaderboard import Leaderboard
+from app.word_selector import selector
+from app.words import DIFFICULTIES, bank
+
+FLUSH_INTERVAL = 5.0  # seconds results are buffered before they are written together
+MAX_BUFFERED = 500  # buffered results that trigger a write straight away
+TOP_SIZE = 10
+
+
+def today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def daily_index(day: str, difficulty: str) -> int:
+    """Index of the word for ``day``, the same in every process and after a restart."""
+    return selector.table(difficulty).sample(random.Random(f'{day}:{difficulty}'))
+
+
+class Puzzle:
+    """One day's word for a difficulty, with what a game shows about it prepared once."""
+    __slots__ = ('day', 'difficulty', 'index', 'word', 'board', 'page')
+
+    def __init__(self, day: str, difficulty: str, index: int, page: Optional[dict]):
+        self.day = day
+        self.difficulty = difficulty
+        self.index = index
+        state = GameState.new(difficulty, index)
+        self.word = state.word
+        self.board = state.display_word()
+        self.page = page  # masked definitions and examples, None if the dictionary had none
+
+    def new_game(self) -> GameState:
+        state = GameState.new(self.difficulty, self.index)
+        state.set(DAILY)
+        return state
+
+
+class DailyChallenge:
+    """The daily word mode: one word per difficulty per UTC day, one attempt each.
+
+    The day's puzzles, including their masked definitions, are prepared by the first
+    request of the day while everybody else waits for them, so a crowd playing the
+    same word costs a single dictionary lookup. Results are buffered and written in
+    bulk every ``flush_interval`` seconds, together with the points they add to the
+    players' scores, so overall scores lag that much behind. The day's leaderboard
+    is loaded once and then updated in memory with every result; with ``max_age``
+    set (several processes recording results) the day's results are also reloaded
+    that often.
+
+    Attempts started but not finished are only tracked in this process, and with
+    several processes a result recorded elsewhere is only seen after a reload; the
+    database keeps the first result of a player for each word either way.
+    """
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL, max_buffered: int = MAX_BUFFERED,
+                 top_size: int = TOP_SIZE, max_age: Optional[float] = None):
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.max_age = max_age
+        self.loaded_at = 0.0
+        self.day: Optional[str] = None
+        self.puzzles: Dict[str, Puzzle] = {}
+        self.played: Set[Tuple[int, str]] = set()  # (player_id, difficulty), started or finished today
+        self.totals: Dict[int, Tuple[str, int]] = {}  # player_id -> (name, points today)
+        self.leaderboard = Leaderboard(top_size)
+        self._pending: List[tuple] = []
+        self._day_lock: Optional[asyncio.Lock] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def prepare(self) -> None:
+        """Load the current day's puzzles and results unless they are loaded already."""
+        day = today()
+        if day == self.day and not self.expired:
+            return
+        if self._day_lock is None:
+            self._day_lock = asyncio.Lock()
+        async with self._day_lock:
+            if day != self.day:
+                await self._start_day(day)
+            elif self.expired:
+                await self._load_results(day)
+
+    @property
+    def expired(self) -> bool:
+        return self.max_age is not None and time.monotonic() - self.loaded_at >= self.max_age
+
+    async def _start_day(self, day: str) -> None:
+        indexes = {difficulty: daily_index(day, difficulty) for difficulty in DIFFICULTIES}
+        pages = await asyncio.gather(*(ox.get_data(bank.get(difficulty).words[indexes[difficulty]], True)
+                                       for difficulty in DIFFICULTIES))
+        self.puzzles = {difficulty: Puzzle(day, difficulty, indexes[difficulty], page)
+                        for difficulty, page in zip(DIFFICULTIES, pages)}
+        self.played = set()
+        await self._load_results(day)
+        self.day = day
+        logging.info(f"Daily puzzles for {day} ready, {len(self.played)} results so far")
+
+    async def _load_results(self, day: str) -> None:
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        # Under the flush lock every local result is either committed or still in _pending
+        async with self._flush_lock:
+            results = list(await bd.get_daily_results(day))
+            recorded = {(player_id, difficulty) for difficulty, player_id, _, _ in results}
+            results.extend((difficulty, player_id, name, points)
+                           for result_day, difficulty, player_id, name, _, _, points, _ in self._pending
+                           if result_day == day and (player_id, difficulty) not in recorded)
+
+        totals: Dict[int, Tuple[str, int]] = {}
+        for difficulty, player_id, name, points in results:
+            self.played.add((player_id, difficulty))
+            totals[player_id] = (name, totals.get(player_id, (name, 0))[1] + points)
+        self.totals = totals
+        counts: Dict[int, int] = {}
+        for _, points in totals.values():
+            counts[points] = counts.get(points, 0) + 1
+        self.leaderboard.load(counts.items(), self._top())
+        self.loaded_at = time.monotonic()
+
+    def _top(self) -> List[Tuple[int, str, int]]:
+        return [(player_id, name, points) for player_id, (name, points) in
+                heapq.nlargest(self.leaderboard.size, self.totals.items(), key=lambda item: item[1][1])]
+
+    async def start(self, player_id: int, difficulty: str) -> Optional[GameState]:
+        """A game on today's word, or ``None`` if the player already had it today."""
+        await self.prepare()
+        if (player_id, difficulty) in self.played:
+            return None
+        self.played.add((player_id, difficulty))
+        return self.puzzles[difficulty].new_game()
+
+    def page(self, state: GameState) -> Optional[dict]:
+        """The prepared masked definitions for a daily game, if its puzzle is still the current one."""
+        puzzle = self.puzzles.get(state.difficulty)
+        if puzzle is None or puzzle.index != state.word_index or puzzle.page is None:
+            return None
+        return puzzle.page
+
+    async def record(self, player_id: int, name: str, state: GameState, points: int) -> bool:
+        """Buffer a finished daily game; ``False`` if its puzzle is no longer the current one."""
+        puzzle = self.puzzles.get(state.difficulty)
+        if puzzle is None or puzzle.index != state.word_index:
+            return False
+        won = engine.is_won(state.info, state.guessed)
+        self._pending.append((puzzle.day, state.difficulty, player_id, name, int(won), state.wrong_guesses,
+                              points, time.time()))
+        self.played.add((player_id, state.difficulty))
+
+        old = self.totals.get(player_id)
+        new = (old[1] if old else 0) + points
+        self.totals[player_id] = (name, new)
+        self.leaderboard.record(player_id, name, old[1] if old else None, new)
+        if self.leaderboard.top_stale:
+            self.leaderboard.load_top(self._top())
+
+        if len(self._pending) >= self.max_buffered:
+            await self._flush_quietly()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return True
+
+    def standing(self, player_id: int) -> Optional[Tuple[int, int, int]]:
+        """Return (points today, rank, number of players today) or ``None`` if the player has none."""
+        entry = self.totals.get(player_id)
+        if entry is None:
+            return None
+        rank, total = self.leaderboard.rank(entry[1])
+        return entry[1], rank, total
+
+    async def _flush_quietly(self) -> None:
+        try:
+            await self.flush()
+        except Exception:
+            pass  # already logged, the results stay buffered for the next flush
+
+    async def _flush_later(self) -> None:
+        # record() starts no second timer while this one runs, so results finished during a
+        # write, or put back by a failed one, wait for another round here
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush_quietly()
+            if not self._pending:
+                return
+
+    async def flush(self) -> None:
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            results, self._pending = self._pending, []
+            try:
+                await bd.save_daily_results(results)
+            except Exception as e:
+                logging.error(f"Failed to save {len(results)} daily results: {e}")
+                self._pending[:0] = results
+                raise
+
+    async def close(self) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+
+challenge = DailyChallenge()
@@ -1,80 +1,480 @@
+import asyncio
+import logging
 import sqlite3
-from typing import List, Optional, Tuple
-
-# Establish a database connection
-conn = sqlite3.connect('hangman.db')
-cursor = conn.cursor()
-
-# Create the scores table if it doesn't exist
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS scores (
-    player_id INTEGER PRIMARY KEY,
-    player_name TEXT,
-    score INTEGER,
-    player_words TEXT  -- New column to store player words
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.leaderboard import Leaderboard
+from app.metrics import DB_LATENCY
+
+DB_PATH = 'hangman.db'
+READER_THREADS = 4
+COMMIT_WINDOW = 0.005  # seconds the writer waits to group more writes into one commit
+MAX_BATCH = 256
+VOCABULARY_PAGE_SIZE = 200  # words per /vocabulary message, well under Telegram's 4096 characters
+PLAYER_ID_PAGE_SIZE = 100
+
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-8000',
 )
-''')
-conn.commit()
 
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS scores (
+        player_id INTEGER PRIMARY KEY,
+        player_name TEXT,
+        score INTEGER,
+        player_words TEXT  -- Legacy comma-joined words, moved to the vocabulary table
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS vocabulary (
+        player_id INTEGER NOT NULL,
+        word TEXT NOT NULL,
+        saved_at REAL NOT NULL
+    )
+    ''',
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_vocabulary_player_word ON vocabulary (player_id, word)',
+    'CREATE INDEX IF NOT EXISTS idx_scores_score ON scores (score)',
+    '''
+    CREATE TABLE IF NOT EXISTS blocked_users (
+        player_id INTEGER PRIMARY KEY,
+        blocked_at REAL NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS broadcasts (
+        job TEXT PRIMARY KEY,
+        last_player_id INTEGER NOT NULL,
+        finished_at REAL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS word_history (
+        player_id INTEGER NOT NULL,
+        difficulty TEXT NOT NULL,
+        list_check INTEGER NOT NULL,  -- checksum of the word list the bits index into
+        seen BLOB NOT NULL,  -- bit i set: word i was played
+        PRIMARY KEY (player_id, difficulty)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS daily_results (
+        day TEXT NOT NULL,  -- UTC date of the puzzle, YYYY-MM-DD
+        difficulty TEXT NOT NULL,
+        player_id INTEGER NOT NULL,
+        player_name TEXT,
+        won INTEGER NOT NULL,
+        wrong_guesses INTEGER NOT NULL,
+        points INTEGER NOT NULL,
+        finished_at REAL NOT NULL,
+        PRIMARY KEY (day, difficulty, player_id)
+    ) WITHOUT ROWID
+    ''',
+)
 
-async def add_chat_id_if_not_exists(player_id: int) -> None:
-    cursor.execute('SELECT player_id FROM scores WHERE player_id = ?', (player_id,))
-    row = cursor.fetchone()
 
-    if not row:
-        cursor.execute('INSERT INTO scores (player_id, player_name, score, player_words) VALUES (?, ?, ?, ?)',
-                       (player_id, "", 0, ""))
-        conn.commit()
+def _migrate_player_words(conn: sqlite3.Connection) -> None:
+    saved_at = time.time()
+    rows = conn.execute("SELECT player_id, player_words FROM scores WHERE player_words != ''").fetchall()
+    for player_id, player_words in rows:
+        conn.executemany('INSERT OR IGNORE INTO vocabulary (player_id, word, saved_at) VALUES (?, ?, ?)',
+                         [(player_id, word, saved_at) for word in player_words.split(', ') if word])
+    conn.execute("UPDATE scores SET player_words = '' WHERE player_words != ''")
 
 
-async def save_score(player_id: int, player_name: str, points: int) -> None:
-    cursor.execute('SELECT score FROM scores WHERE player_id = ?', (player_id,))
-    row = cursor.fetchone()
+# MIGRATIONS[n] upgrades a database from user_version n to n + 1
+MIGRATIONS = (
+    _migrate_player_words,
+)
+
+
+def _noop(conn: sqlite3.Connection) -> None:
+    pass
+
+
+class Database:
+    """SQLite access that never blocks the event loop.
+
+    Reads run on a small thread pool, each thread with its own connection. Writes are
+    queued to a single writer task that runs everything arriving within
+    ``commit_window`` in one transaction, each write in its own savepoint.
+    """
+
+    def __init__(self, path: str = DB_PATH, schema: Sequence[str] = SCHEMA,
+                 migrations: Sequence[Callable[[sqlite3.Connection], None]] = MIGRATIONS,
+                 commit_window: float = COMMIT_WINDOW, max_batch: int = MAX_BATCH):
+        self.path = path
+        self.schema = schema
+        self.migrations = migrations
+        self.commit_window = commit_window
+        self.max_batch = max_batch
+        self._connections: List[sqlite3.Connection] = []
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        self._readers: Optional[ThreadPoolExecutor] = None
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        with self._init_lock:
+            if not self._initialized:
+                for statement in self.schema:
+                    conn.execute(statement)
+                self._migrate(conn)
+                self._initialized = True
+            self._connections.append(conn)
+        return conn
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for target, migration in enumerate(self.migrations[version:], start=version + 1):
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                migration(conn)
+                conn.execute(f'PRAGMA user_version = {target}')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            logging.info(f"Migrated {self.path} to version {target}")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    def _run_read(self, fn: Callable, args: tuple):
+        return fn(self._connection(), *args)
+
+    def _run_batch(self, batch: List[Tuple[Callable, tuple, asyncio.Future]]) -> List[Tuple[bool, Any]]:
+        conn = self._connection()
+        results = []
+        conn.execute('BEGIN')
+        try:
+            for fn, args, _ in batch:
+                conn.execute('SAVEPOINT op')
+                try:
+                    result = fn(conn, *args)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO op')
+                    results.append((False, e))
+                else:
+                    results.append((True, result))
+                conn.execute('RELEASE op')
+            conn.execute('COMMIT')
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            return [(False, e)] * len(batch)
+        return results
+
+    async def open(self) -> None:
+        """Connect, create the schema and migrate now rather than on the first query."""
+        await self.read(_noop)
+
+    async def read(self, fn: Callable, *args):
+        """Run ``fn(conn, *args)`` on a reader thread."""
+        if self._readers is None:
+            self._readers = ThreadPoolExecutor(READER_THREADS, thread_name_prefix='db-read')
+        with DB_LATENCY.time(fn.__name__, 'read'):
+            return await asyncio.get_running_loop().run_in_executor(self._readers, self._run_read, fn, args)
+
+    async def write(self, fn: Callable, *args):
+        """Queue ``fn(conn, *args)`` for the writer and wait until its batch is committed."""
+        if self._writer_task is None or self._writer_task.done():
+            self._queue = asyncio.Queue()
+            self._writer = self._writer or ThreadPoolExecutor(1, thread_name_prefix='db-write')
+            self._writer_task = asyncio.create_task(self._write_loop())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((fn, args, future))
+        with DB_LATENCY.time(fn.__name__, 'write'):
+            return await future
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            op = await self._queue.get()
+            if op is None:
+                return
+            if self.commit_window:
+                await asyncio.sleep(self.commit_window)
+            batch = [op]
+            stop = False
+            while len(batch) < self.max_batch and not self._queue.empty():
+                op = self._queue.get_nowait()
+                if op is None:
+                    stop = True
+                    break
+                batch.append(op)
+            try:
+                results = await loop.run_in_executor(self._writer, self._run_batch, batch)
+            except Exception as e:
+                logging.error(f"Database write batch failed: {e}")
+                results = [(False, e)] * len(batch)
+            for (_, _, future), (ok, value) in zip(batch, results):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+            if stop:
+                return
+
+    async def close(self) -> None:
+        if self._writer_task is not None and not self._writer_task.done():
+            self._queue.put_nowait(None)
+            await self._writer_task
+        self._writer_task = None
+        for executor in (self._readers, self._writer):
+            if executor is not None:
+                executor.shutdown(wait=True)
+        self._readers = self._writer = None
+        with self._init_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+db = Database()
+leaderboard = Leaderboard()
+_leaderboard_lock: Optional[asyncio.Lock] = None
+
+
+def _add_chat_id_if_not_exists(conn: sqlite3.Connection, player_id: int) -> bool:
+    # /start from someone who had blocked the bot means they are reachable again
+    conn.execute('DELETE FROM blocked_users WHERE player_id = ?', (player_id,))
+    cursor = conn.execute('INSERT OR IGNORE INTO scores (player_id, player_name, score, player_words) '
+                          'VALUES (?, ?, ?, ?)', (player_id, "", 0, ""))
+    return cursor.rowcount > 0
+
+
+def _save_score(conn: sqlite3.Connection, player_id: int, player_name: str,
+                points: int) -> Tuple[str, Optional[int], int]:
+    row = conn.execute('SELECT player_name, score FROM scores WHERE player_id = ?', (player_id,)).fetchone()
 
     if row:
-        current_score = row[0]
-        new_score = current_score + points
-        cursor.execute('UPDATE scores SET score = ? WHERE player_id = ?', (new_score, player_id))
-    else:
-        cursor.execute('INSERT INTO scores (player_id, player_name, score, player_words) VALUES (?, ?, ?, ?)',
-                       (player_id, player_name, points, ''))
+        current_name, current_score = row
+        new_score = (current_score or 0) + points
+        conn.execute('UPDATE scores SET score = ? WHERE player_id = ?', (new_score, player_id))
+        return current_name, current_score, new_score
+
+    conn.execute('INSERT INTO scores (player_id, player_name, score, player_words) VALUES (?, ?, ?, ?)',
+                 (player_id, player_name, points, ''))
+    return player_name, None, points
+
+
+def _save_word(conn: sqlite3.Connection, player_id: int, word: str) -> int:
+    cursor = conn.execute('INSERT OR IGNORE INTO vocabulary (player_id, word, saved_at) VALUES (?, ?, ?)',
+                          (player_id, word, time.time()))
+    return cursor.rowcount  # 0 if the word was already saved
+
+
+def _fetch_one(conn: sqlite3.Connection, query: str, params: tuple):
+    return conn.execute(query, params).fetchone()
+
+
+def _fetch_all(conn: sqlite3.Connection, query: str, params: tuple):
+    return conn.execute(query, params).fetchall()
+
+
+def _load_leaderboard(conn: sqlite3.Connection, size: int):
+    counts = conn.execute('SELECT score, COUNT(*) FROM scores WHERE score IS NOT NULL GROUP BY score').fetchall()
+    return counts, _load_top(conn, size)
 
-    conn.commit()
+
+def _load_top(conn: sqlite3.Connection, size: int):
+    return conn.execute('SELECT player_id, player_name, score FROM scores WHERE score IS NOT NULL '
+                        'ORDER BY score DESC LIMIT ?', (size,)).fetchall()
+
+
+async def _get_leaderboard() -> Leaderboard:
+    global _leaderboard_lock
+    if leaderboard.loaded and not leaderboard.top_stale and not leaderboard.expired:
+        return leaderboard
+    if _leaderboard_lock is None:
+        _leaderboard_lock = asyncio.Lock()
+    async with _leaderboard_lock:
+        if not leaderboard.loaded or leaderboard.expired:
+            # Writes are applied to the leaderboard only once it is loaded; load from the writer
+            # so no commit can land between the snapshot and the first incremental update
+            counts, top = await db.write(_load_leaderboard, leaderboard.size)
+            leaderboard.load(counts, top)
+        elif leaderboard.top_stale:
+            leaderboard.load_top(await db.write(_load_top, leaderboard.size))
+    return leaderboard
+
+
+async def add_chat_id_if_not_exists(player_id: int) -> None:
+    if await db.write(_add_chat_id_if_not_exists, player_id):
+        leaderboard.record(player_id, "", None, 0)
+
+
+async def save_score(player_id: int, player_name: str, points: int) -> None:
+    name, old_score, new_score = await db.write(_save_score, player_id, player_name, points)
+    leaderboard.record(player_id, name, old_score, new_score)
 
 
 async def get_score(player_id: int) -> Optional[int]:
-    cursor.execute('SELECT score FROM scores WHERE player_id = ?', (player_id,))
-    row = cursor.fetchone()
+    row = await db.read(_fetch_one, 'SELECT score FROM scores WHERE player_id = ?', (player_id,))
     return row[0] if row else None
 
 
+async def get_rank(player_id: int) -> Optional[Tuple[int, int, int]]:
+    """Return (score, rank, number of ranked players) or ``None`` for an unknown player."""
+    score = await get_score(player_id)
+    if score is None:
+        return None
+    rank, total = (await _get_leaderboard()).rank(score)
+    return score, rank, total
+
+
 async def get_top_scores(limit: int = 10) -> List[Tuple[str, int]]:
-    cursor.execute('SELECT player_name, score FROM scores ORDER BY score DESC LIMIT ?', (limit,))
-    return cursor.fetchall()
+    if limit > leaderboard.size:
+        return await db.read(_fetch_all, 'SELECT player_name, score FROM scores WHERE score IS NOT NULL '
+                                         'ORDER BY score DESC LIMIT ?', (limit,))
+    return (await _get_leaderboard()).top(limit)
 
 
 async def save_word(player_id: int, word: str) -> int:
-    cursor.execute('SELECT player_words FROM scores WHERE player_id = ?', (player_id,))
-    row = cursor.fetchone()
+    return await db.write(_save_word, player_id, word)
 
-    if row:
-        current_words = row[0]
-        if current_words:
-            word_list = current_words.split(', ')
-            if word in word_list:
-                return 0  # Word already exists, return 0
-            new_words = f"{current_words}, {word}"
+
+async def iter_player_words(player_id: int, page_size: int = VOCABULARY_PAGE_SIZE) -> AsyncIterator[List[str]]:
+    """Yield the player's saved words in alphabetical pages of at most ``page_size``."""
+    last_word = ''
+    while True:
+        rows = await db.read(_fetch_all,
+                             'SELECT word FROM vocabulary WHERE player_id = ? AND word > ? ORDER BY word LIMIT ?',
+                             (player_id, last_word, page_size))
+        if not rows:
+            return
+        words = [row[0] for row in rows]
+        yield words
+        if len(words) < page_size:
+            return
+        last_word = words[-1]
+
+
+async def iter_player_ids(after: int = 0, page_size: int = PLAYER_ID_PAGE_SIZE) -> AsyncIterator[List[int]]:
+    """Yield ids of players that have not blocked the bot, ascending, in pages of at most ``page_size``."""
+    while True:
+        rows = await db.read(_fetch_all,
+                             'SELECT player_id FROM scores WHERE player_id > ? AND player_id NOT IN '
+                             '(SELECT player_id FROM blocked_users) ORDER BY player_id LIMIT ?',
+                             (after, page_size))
+        if not rows:
+            return
+        player_ids = [row[0] for row in rows]
+        yield player_ids
+        if len(player_ids) < page_size:
+            return
+        after = player_ids[-1]
+
+
+def _mark_blocked(conn: sqlite3.Connection, player_id: int) -> None:
+    conn.execute('INSERT OR REPLACE INTO blocked_users (player_id, blocked_at) VALUES (?, ?)',
+                 (player_id, time.time()))
+
+
+def _save_broadcast_cursor(conn: sqlite3.Connection, job: str, last_player_id: int, finished: bool) -> None:
+    conn.execute('INSERT OR REPLACE INTO broadcasts (job, last_player_id, finished_at) VALUES (?, ?, ?)',
+                 (job, last_player_id, time.time() if finished else None))
+
+
+async def mark_blocked(player_id: int) -> None:
+    await db.write(_mark_blocked, player_id)
+
+
+async def get_broadcast_cursor(job: str) -> Tuple[int, bool]:
+    """Return (last player id sent to, whether the job finished) for a broadcast job."""
+    row = await db.read(_fetch_one, 'SELECT last_player_id, finished_at FROM broadcasts WHERE job = ?', (job,))
+    return (row[0], row[1] is not None) if row else (0, False)
+
+
+async def save_broadcast_cursor(job: str, last_player_id: int, finished: bool = False) -> None:
+    await db.write(_save_broadcast_cursor, job, last_player_id, finished)
+
+
+def _save_word_history(conn: sqlite3.Connection, player_id: int, difficulty: str, list_check: int,
+                       seen: bytes) -> None:
+    conn.execute('INSERT OR REPLACE INTO word_history (player_id, difficulty, list_check, seen) '
+                 'VALUES (?, ?, ?, ?)', (player_id, difficulty, list_check, seen))
+
+
+async def get_word_history(player_id: int, difficulty: str) -> Optional[Tuple[int, bytes]]:
+    """Return (word list checksum, seen-word bitset) for a player, or ``None`` if they have none."""
+    return await db.read(_fetch_one, 'SELECT list_check, seen FROM word_history '
+                                     'WHERE player_id = ? AND difficulty = ?', (player_id, difficulty))
+
+
+async def save_word_history(player_id: int, difficulty: str, list_check: int, seen: bytes) -> None:
+    await db.write(_save_word_history, player_id, difficulty, list_check, seen)
+
+
+def _save_daily_results(conn: sqlite3.Connection,
+                        results: List[tuple]) -> List[Tuple[int, str, Optional[int], int]]:
+    days = sorted({result[0] for result in results})
+    player_ids = sorted({result[2] for result in results})
+    recorded = set(conn.execute(
+        f'SELECT day, difficulty, player_id FROM daily_results WHERE day IN ({", ".join("?" * len(days))}) '
+        f'AND player_id IN ({", ".join("?" * len(player_ids))})', (*days, *player_ids)))
+    earned: Dict[int, List] = {}  # player_id -> [name, points]
+    fresh = []
+    for result in results:
+        day, difficulty, player_id, player_name, _, _, points, _ = result
+        if (day, difficulty, player_id) in recorded:
+            continue  # already recorded by another process
+        recorded.add((day, difficulty, player_id))
+        fresh.append(result)
+        entry = earned.setdefault(player_id, [player_name, 0])
+        entry[1] += points
+    if not fresh:
+        return []
+    conn.executemany('INSERT INTO daily_results (day, difficulty, player_id, player_name, won, wrong_guesses, '
+                     'points, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', fresh)
+
+    marks = ', '.join('?' * len(earned))
+    current = {player_id: (name, score) for player_id, name, score in conn.execute(
+        f'SELECT player_id, player_name, score FROM scores WHERE player_id IN ({marks})', tuple(earned))}
+    conn.executemany("INSERT INTO scores (player_id, player_name, score, player_words) VALUES (?, ?, ?, '') "
+                     'ON CONFLICT (player_id) DO UPDATE SET score = COALESCE(score, 0) + excluded.score',
+                     [(player_id, name, points) for player_id, (name, points) in earned.items()])
+    changes = []
+    for player_id, (name, points) in earned.items():
+        if player_id in current:
+            current_name, current_score = current[player_id]
+            changes.append((player_id, current_name, current_score, (current_score or 0) + points))
         else:
-            new_words = word
-        cursor.execute('UPDATE scores SET player_words = ? WHERE player_id = ?', (new_words, player_id))
-    else:
-        cursor.execute('INSERT INTO scores (player_id, player_words) VALUES (?, ?)', (player_id, word))
+            changes.append((player_id, name, None, points))
+    return changes
 
-    conn.commit()
-    return 1  # Successfully added the word, return 1
 
+async def get_daily_results(day: str) -> List[Tuple[str, int, str, int]]:
+    """Return (difficulty, player id, name, points) for every result recorded for ``day``."""
+    return await db.read(_fetch_all, 'SELECT difficulty, player_id, player_name, points FROM daily_results '
+                                     'WHERE day = ?', (day,))
 
-async def get_player_words(player_id: int) -> Optional[str]:
-    cursor.execute('SELECT player_words FROM scores WHERE player_id = ?', (player_id,))
-    row = cursor.fetchone()
-    return row[0] if row else None
+
+async def save_daily_results(results: List[tuple]) -> None:
+    """Record daily results and add their points to the players' scores, all in one write.
+
+    Each result is (day, difficulty, player id, name, won, wrong guesses, points, finished at);
+    one that was already recorded for that day and difficulty is skipped.
+    """
+    for change in await db.write(_save_daily_results, results):
+        leaderboard.record(*change)
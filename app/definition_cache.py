@@ -0,0 +1,148 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.masking import mask_page
+from app.metrics import CACHE_LOOKUPS
+
+DB_PATH = 'definitions.db'
+MEMORY_SIZE = 1024  # entries kept in the in-process LRU
+MAX_ROWS = 20000  # entries kept on disk
+TTL = 30 * 24 * 3600  # seconds a fetched page stays fresh
+NEGATIVE_TTL = 24 * 3600  # seconds a "no such word" answer stays fresh
+MAX_ITEMS = 5  # definitions/examples stored per word
+PRUNE_EVERY = 200  # puts between disk size checks
+
+MISSING = object()
+
+
+class DefinitionCache:
+    """Two-tier cache of parsed dictionary pages keyed by word.
+
+    Entries hold the page as parsed plus a copy with the word masked for in-game
+    use, made once when the page is stored; ``None`` marks a word the site does not have.
+    ``get`` returns ``MISSING`` when nothing fresh is cached.
+    """
+
+    def __init__(self, path: str = DB_PATH, memory_size: int = MEMORY_SIZE, max_rows: int = MAX_ROWS,
+                 ttl: float = TTL, negative_ttl: float = NEGATIVE_TTL):
+        self.path = path
+        self.memory_size = memory_size
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._memory: "OrderedDict[str, Tuple[Optional[Dict[str, List[str]]], float]]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._puts = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS definitions (
+                word TEXT PRIMARY KEY,
+                found INTEGER NOT NULL,
+                data TEXT,
+                fetched_at REAL NOT NULL
+            )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_definitions_fetched_at ON definitions (fetched_at)')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _expires_at(self, entry: Optional[dict], fetched_at: float) -> float:
+        return fetched_at + (self.ttl if entry is not None else self.negative_ttl)
+
+    def _remember(self, word: str, entry: Optional[dict], fetched_at: float) -> None:
+        self._memory[word] = (entry, fetched_at)
+        self._memory.move_to_end(word)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _read(self, word: str):
+        with self._lock:
+            row = self._connect().execute('SELECT found, data, fetched_at FROM definitions WHERE word = ?',
+                                          (word,)).fetchone()
+        if row is None:
+            return MISSING
+        found, data, fetched_at = row
+        return (json.loads(data) if found else None), fetched_at
+
+    def _write(self, word: str, entry: Optional[dict], fetched_at: float) -> None:
+        data = json.dumps(entry, separators=(',', ':')) if entry is not None else None
+        with self._lock:
+            conn = self._connect()
+            conn.execute('INSERT OR REPLACE INTO definitions (word, found, data, fetched_at) VALUES (?, ?, ?, ?)',
+                         (word, entry is not None, data, fetched_at))
+            self._puts += 1
+            if self._puts % PRUNE_EVERY == 0:
+                self._prune(conn)
+            conn.commit()
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        now = time.time()
+        conn.execute('DELETE FROM definitions WHERE (found AND fetched_at < ?) OR (NOT found AND fetched_at < ?)',
+                     (now - self.ttl, now - self.negative_ttl))
+        conn.execute('DELETE FROM definitions WHERE word IN '
+                     '(SELECT word FROM definitions ORDER BY fetched_at DESC LIMIT -1 OFFSET ?)', (self.max_rows,))
+
+    def _fresh_words(self) -> Set[str]:
+        now = time.time()
+        with self._lock:
+            rows = self._connect().execute(
+                'SELECT word FROM definitions WHERE (found AND fetched_at >= ?) OR (NOT found AND fetched_at >= ?)',
+                (now - self.ttl, now - self.negative_ttl)).fetchall()
+        return {row[0] for row in rows}
+
+    async def fresh_words(self) -> Set[str]:
+        """Words with an unexpired entry on disk."""
+        return await asyncio.get_running_loop().run_in_executor(None, self._fresh_words)
+
+    async def get(self, word: str):
+        now = time.time()
+        cached = self._memory.get(word)
+        if cached is not None:
+            entry, fetched_at = cached
+            if self._expires_at(entry, fetched_at) > now:
+                self._memory.move_to_end(word)
+                CACHE_LOOKUPS.inc('memory')
+                return entry
+            del self._memory[word]
+
+        stored = await asyncio.get_running_loop().run_in_executor(None, self._read, word)
+        if stored is MISSING:
+            CACHE_LOOKUPS.inc('miss')
+            return MISSING
+        entry, fetched_at = stored
+        if self._expires_at(entry, fetched_at) <= now:
+            CACHE_LOOKUPS.inc('miss')
+            return MISSING
+        self._remember(word, entry, fetched_at)
+        CACHE_LOOKUPS.inc('disk')
+        return entry
+
+    async def put(self, word: str, page: Optional[Dict[str, List[str]]]) -> None:
+        entry = None
+        if page is not None:
+            entry = {key: page[key][:MAX_ITEMS] for key in ('definitions', 'examples')}
+            entry.update(mask_page(word, entry))
+        fetched_at = time.time()
+        self._remember(word, entry, fetched_at)
+        await asyncio.get_running_loop().run_in_executor(None, self._write, word, entry, fetched_at)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+cache = DefinitionCache()
@@ -0,0 +1,123 @@
+"""Hangman rules without any Bot I/O.
+
+Everything a guess needs is precomputed once per word: the mask of distinct
+letters and where each letter sits. A game is won when no bit of that mask is
+left unguessed, so no guess walks the whole word.
+"""
+import random
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+MAX_WRONG_GUESSES = {'easy': 8, 'medium': 7, 'hard': 6}
+MAX_HINTS = 2
+
+# Guess outcomes
+NOT_A_LETTER = 'not_a_letter'
+ALREADY_GUESSED = 'already_guessed'
+ALREADY_WRONG = 'already_wrong'
+HIT = 'hit'
+MISS = 'miss'
+WON = 'won'
+LOST = 'lost'
+
+_WIN_DIFFICULTY = {'hard': 2, 'medium': 1.6, 'easy': 1.2}
+_WIN_HINTS = (1.5, 1.2, 1)
+_LOSS_DIFFICULTY = {'hard': 1.2, 'medium': 1.5, 'easy': 2}
+_LOSS_HINTS = (1, 1.5, 2)
+
+
+def _points(won: bool, difficulty: str, hints_used: int, length_bonus: bool) -> int:
+    multiplier = 1.2 if length_bonus else 1
+    if won:
+        return round(10 * _WIN_DIFFICULTY[difficulty] * _WIN_HINTS[hints_used] * multiplier)
+    return round(-10 * _LOSS_DIFFICULTY[difficulty] * _LOSS_HINTS[hints_used] * multiplier)
+
+
+# (won, difficulty, hints used, length bonus) -> points
+POINTS = {
+    (won, difficulty, hints_used, length_bonus): _points(won, difficulty, hints_used, length_bonus)
+    for won in (True, False) for difficulty in MAX_WRONG_GUESSES for hints_used in range(MAX_HINTS + 1)
+    for length_bonus in (True, False)
+}
+
+
+def letter_bit(letter: str) -> int:
+    """Bit of ``letter`` in a guessed/wrong mask, 0 for anything outside a-z."""
+    code = ord(letter) - 97
+    return 1 << code if 0 <= code < 26 and len(letter) == 1 else 0
+
+
+class WordInfo:
+    """What the rules need to know about a word, computed once and shared by every game."""
+    __slots__ = ('word', 'letters', 'positions', 'distinct')
+
+    def __init__(self, word: str):
+        self.word = word
+        positions: Dict[int, list] = {}
+        for i, char in enumerate(word):
+            bit = letter_bit(char)
+            if bit:
+                positions.setdefault(bit, []).append(i)
+        self.positions: Dict[int, Tuple[int, ...]] = {bit: tuple(indexes) for bit, indexes in positions.items()}
+        self.letters = sum(self.positions)  # mask of the distinct letters to find
+        # Scoring has always counted distinct characters, hyphens included
+        self.distinct = len(set(word))
+
+
+@lru_cache(maxsize=4096)
+def word_info(word: str) -> WordInfo:
+    return WordInfo(word)
+
+
+def is_won(info: WordInfo, guessed: int) -> bool:
+    return not info.letters & ~guessed
+
+
+def guess_letter(state, letter: str) -> str:
+    """Apply a single-letter guess to ``state`` and return its outcome."""
+    info = state.info
+    bit = letter_bit(letter)
+    if not bit:
+        # Digits, punctuation and hyphens are never hidden, so they are no guess at all
+        return NOT_A_LETTER
+    if state.guessed & bit:
+        return ALREADY_GUESSED
+    if bit & info.letters:
+        state.reveal(bit)
+        return WON if is_won(info, state.guessed) else HIT
+    if state.wrong & bit:
+        return ALREADY_WRONG
+    return record_miss(state, bit)
+
+
+def guess_word(state, word: str) -> str:
+    if word == state.word:
+        state.reveal(state.info.letters)
+        return WON
+    return record_miss(state, 0)
+
+
+def record_miss(state, bit: int) -> str:
+    state.wrong_guesses += 1
+    state.wrong |= bit
+    return LOST if state.wrong_guesses >= MAX_WRONG_GUESSES[state.difficulty] else MISS
+
+
+def hint(state, rng: random.Random = random) -> Optional[str]:
+    """Reveal a random hidden letter, more likely the more often it occurs, and return it."""
+    hidden = [(bit, len(indexes)) for bit, indexes in state.info.positions.items() if not state.guessed & bit]
+    if not hidden:
+        return None
+    bits, weights = zip(*hidden)
+    bit = rng.choices(bits, weights)[0]
+    state.reveal(bit)
+    state.hints_used += 1
+    return chr(96 + bit.bit_length())
+
+
+def points(state) -> int:
+    info = state.info
+    won = is_won(info, state.guessed)
+    # Varied words earn a bonus when guessed, words with few letters soften a loss
+    length_bonus = info.distinct >= 3 if won else info.distinct <= 3
+    return POINTS[won, state.difficulty, min(state.hints_used, MAX_HINTS), length_bonus]
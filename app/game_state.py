@@ -0,0 +1,141 @@
+import base64
+import binascii
+import random
+import struct
+import zlib
+from typing import Optional
+
+from app.engine import word_info
+from app.words import DIFFICULTIES, bank
+
+FORMAT_VERSION = 3
+# version, difficulty, word index, word checksum, guessed mask, wrong mask, wrong guesses, hints used, flags
+_STRUCT_V1 = struct.Struct('<BBHHIIBBB')
+# v1 fields, board message id, 16-bit board checksum
+_STRUCT_V2 = struct.Struct('<BBHHIIBBBIH')
+# v1 fields, board message id, board checksum
+_STRUCT = struct.Struct('<BBHHIIBBBII')
+
+USED_DEFINITION = 1
+END_GAME = 2
+MADE_MISTAKE = 4
+GET_SCORE = 8
+SAVED_WORD = 16
+DAILY = 32
+
+
+def word_checksum(word: str) -> int:
+    return zlib.crc32(word.encode()) & 0xFFFF
+
+
+def board_checksum(board: str) -> int:
+    # The full 32 bits: a collision would leave a changed board unedited
+    return zlib.crc32(board.encode())
+
+
+def mask_letters(mask: int) -> str:
+    return ''.join(chr(97 + i) for i in range(26) if mask >> i & 1)
+
+
+class GameState:
+    """Everything a single-player game needs to continue, in a few small ints.
+
+    The word is stored as an index into the shared word bank plus a checksum, so a
+    state saved before a word list was edited is recognised as stale instead of
+    silently switching words. Letters are stored as 26-bit masks. The masked word is
+    built from the letters' precomputed positions and cached until the next reveal.
+    """
+    __slots__ = ('difficulty', 'word_index', 'word_check', 'guessed', 'wrong', 'wrong_guesses',
+                 'hints_used', 'flags', 'board_message_id', 'board_check', 'word', 'info', '_display_text')
+
+    def __init__(self, difficulty: str, word_index: int, word: str, guessed: int = 0, wrong: int = 0,
+                 wrong_guesses: int = 0, hints_used: int = 0, flags: int = 0, board_message_id: int = 0,
+                 board_check: int = 0):
+        self.difficulty = difficulty
+        self.word_index = word_index
+        self.word = word
+        self.info = word_info(word)
+        self.word_check = word_checksum(word)
+        self.guessed = guessed
+        self.wrong = wrong
+        self.wrong_guesses = wrong_guesses
+        self.hints_used = hints_used
+        self.flags = flags
+        self.board_message_id = board_message_id
+        self.board_check = board_check
+        self._display_text: Optional[str] = None
+
+    @classmethod
+    def new(cls, difficulty: str, index: Optional[int] = None) -> 'GameState':
+        words = bank.get(difficulty).words
+        if index is None or index >= len(words):
+            index = random.randrange(len(words))
+        return cls(difficulty, index, words[index])
+
+    def has(self, flag: int) -> bool:
+        return bool(self.flags & flag)
+
+    def set(self, flag: int, value: bool = True) -> None:
+        if value:
+            self.flags |= flag
+        else:
+            self.flags &= ~flag
+
+    def reveal(self, mask: int) -> None:
+        """Mark every letter in ``mask`` as guessed."""
+        if mask & ~self.guessed:
+            self.guessed |= mask
+            self._display_text = None
+
+    def display_word(self) -> str:
+        if self._display_text is None:
+            # Hyphens and other non-letters are never hidden
+            display = list(self.word)
+            for bit, indexes in self.info.positions.items():
+                if not self.guessed & bit:
+                    for i in indexes:
+                        display[i] = '_'
+            self._display_text = ' '.join(display)
+        return self._display_text
+
+    def to_bytes(self) -> bytes:
+        return _STRUCT.pack(FORMAT_VERSION, DIFFICULTIES.index(self.difficulty), self.word_index, self.word_check,
+                            self.guessed, self.wrong, self.wrong_guesses, self.hints_used, self.flags,
+                            self.board_message_id, self.board_check)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Optional['GameState']:
+        """Decode a state, or return ``None`` if it is malformed or its word is gone."""
+        board_message_id = board_check = 0
+        try:
+            if data[:1] == b'\x01':
+                (version, difficulty, word_index, word_check, guessed, wrong, wrong_guesses, hints_used,
+                 flags) = _STRUCT_V1.unpack(data)
+            elif data[:1] == b'\x02':
+                # The old 16-bit board checksum can't be compared, so the next render edits the board
+                (version, difficulty, word_index, word_check, guessed, wrong, wrong_guesses, hints_used,
+                 flags, board_message_id, _) = _STRUCT_V2.unpack(data)
+            else:
+                (version, difficulty, word_index, word_check, guessed, wrong, wrong_guesses, hints_used,
+                 flags, board_message_id, board_check) = _STRUCT.unpack(data)
+        except struct.error:
+            return None
+        if version > FORMAT_VERSION or difficulty >= len(DIFFICULTIES):
+            return None
+        words = bank.get(DIFFICULTIES[difficulty]).words
+        if word_index >= len(words) or word_checksum(words[word_index]) != word_check:
+            return None
+        return cls(DIFFICULTIES[difficulty], word_index, words[word_index], guessed, wrong, wrong_guesses,
+                   hints_used, flags, board_message_id, board_check)
+
+    def encode(self) -> str:
+        """Serialize to a short ASCII string that any FSM storage can hold."""
+        return base64.urlsafe_b64encode(self.to_bytes()).decode('ascii')
+
+    @classmethod
+    def decode(cls, data: str) -> Optional['GameState']:
+        try:
+            raw = base64.urlsafe_b64decode(data)
+        except (binascii.Error, ValueError, TypeError):
+            return None
+        return cls.from_bytes(raw)
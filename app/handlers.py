@@ -1,24 +1,62 @@
 # handlers.py
 from aiogram import F, Router, Bot
 from aiogram.enums import ChatType
-from aiogram.types import Message, CallbackQuery
-from aiogram.filters import CommandStart, Command
+from aiogram.types import Chat, Message, CallbackQuery
+from aiogram.filters import CommandStart, Command, CommandObject
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 import logging
+from typing import Optional
 
 import app.keyboards as kb
 import app.db as bd
 import app.oxford_api as ox
+from app.daily import challenge
+from app.game_state import GameState
+from app.metrics import ACTIVE_GAMES, MetricsMiddleware
+from app.multiplayer import groups
+from app.server_logs import guess_log
 from app.utils import HangmanGame
+from app.words import DIFFICULTIES
 
 router = Router()
+router.message.middleware(MetricsMiddleware())
+router.callback_query.middleware(MetricsMiddleware())
+
+GROUP_CHATS = {ChatType.GROUP, ChatType.SUPERGROUP}
+DEFAULT_GROUP_DIFFICULTY = 'medium'
 
 
 class GameStates(StatesGroup):
     playing = State()
 
 
+async def load_game(state: FSMContext, chat: Chat) -> Optional[HangmanGame]:
+    data = await state.get_data()
+    encoded = data.get('game')
+    game_state = GameState.decode(encoded) if encoded else None
+    if game_state is None:
+        return None
+    return HangmanGame.from_state(chat.first_name, chat.id, game_state)
+
+
+async def end_turn(state: FSMContext, game: HangmanGame, bot: Bot) -> None:
+    if game.end_game:
+        ACTIVE_GAMES.discard(game.chat_id)
+    else:
+        ACTIVE_GAMES.touch(game.chat_id)
+    try:
+        await game.flush(bot)
+    finally:
+        # Saved after flushing so the id of a newly sent board message is kept
+        await state.update_data(game=game.state.encode())
+
+
+async def close_prompt(callback: CallbackQuery) -> None:
+    # Prompts share a message with the rest of the turn, so only their keyboard goes away
+    await callback.message.edit_reply_markup(reply_markup=None)
+
+
 @router.message(CommandStart())
 async def cmd_start(message: Message):
     logging.info(f"User {message.from_user.id} called /start")
@@ -26,7 +64,9 @@ async def cmd_start(message: Message):
     await message.reply(f"""
     Welcome to Hangman Bot! Here are the available commands:
     /start - Show this message
-    /play - Start a new game
+    /play - Start a new game (in a group: /play [easy|medium|hard], everyone guesses together)
+    /guess <letter or word> - Guess in a game (in a group, replying to the board works too)
+    /daily - Play today's word, the same for everyone, and see the daily leaderboard
     /me - Show your score
     /top - Show top 10 players and scores
     /vocabulary - Show all saved words
@@ -35,24 +75,97 @@ async def cmd_start(message: Message):
 
 
 @router.message(Command('play'))
-async def cmd_play(message: Message):
+async def cmd_play(message: Message, command: CommandObject, bot: Bot):
     logging.info(f"User {message.from_user.id} called /play")
     if message.chat.type == ChatType.PRIVATE:
         await message.reply("Choose difficulty", reply_markup=kb.difficulty)
+    elif message.chat.type in GROUP_CHATS and not groups.enabled:
+        await message.reply("Group games aren't available on this server, "
+                            "please start the game in a private chat with the bot.")
+    elif message.chat.type in GROUP_CHATS:
+        difficulty = (command.args or DEFAULT_GROUP_DIFFICULTY).strip().lower()
+        if difficulty not in DIFFICULTIES:
+            await message.reply("Use /play, /play easy, /play medium or /play hard.")
+        elif await groups.start(bot, message.chat.id, difficulty) is None:
+            await message.reply("A game is already running here, keep guessing!")
+        else:
+            await message.answer("Everyone plays the same word: reply to the board with a letter or the whole "
+                                 "word, or use /guess <letter or word>. First to finish wins the bonus.")
     else:
         await message.reply("Please start the game in a private chat with the bot.")
 
 
+@router.message(Command('guess'), F.chat.type.in_(GROUP_CHATS))
+async def cmd_group_guess(message: Message, command: CommandObject):
+    if command.args:
+        await group_guess(message, command.args.strip().lower())
+
+
+# Without the bot's privacy mode, plain messages in the group work as guesses too: replies to
+# the board count like /guess, anything else is chat unless it is the word itself
+@router.message(F.chat.type.in_(GROUP_CHATS), F.text.regexp(r'^[A-Za-z]+(-[A-Za-z]+)*$'),
+                lambda message: groups.get(message.chat.id) is not None)
+async def group_guess_message(message: Message):
+    game = groups.get(message.chat.id)
+    reply = message.reply_to_message
+    aimed = game is not None and reply is not None and reply.message_id == game.board_message_id
+    await group_guess(message, message.text.lower(), casual=not aimed)
+
+
+async def group_guess(message: Message, guess: str, casual: bool = False) -> None:
+    guess_log.info(f"User {message.from_user.id} guessed {guess} in group {message.chat.id}",
+                   extra={'user_id': message.from_user.id, 'chat_id': message.chat.id, 'guess': guess})
+    await groups.guess(message.chat.id, message.from_user.id, message.from_user.first_name, guess, casual)
+
+
 @router.callback_query(F.data.in_(['easy', 'medium', 'hard']))
 async def start_game(callback: CallbackQuery, state: FSMContext, bot: Bot):
     difficulty = callback.data
     logging.info(f"User {callback.from_user.id} started a game with difficulty {difficulty}")
     await callback.message.reply(f"Starting {difficulty} game...")
     await callback.message.delete()
-    game = HangmanGame(callback.message.chat.first_name, callback.message.chat.id, difficulty=difficulty)
-    await state.update_data(game=game)
+    game = await HangmanGame.create(callback.message.chat.first_name, callback.message.chat.id, difficulty)
     await state.set_state(GameStates.playing)
     await game.start_game(bot)
+    await end_turn(state, game, bot)
+
+
+@router.message(Command('daily'))
+async def cmd_daily(message: Message):
+    logging.info(f"User {message.from_user.id} called /daily")
+    await challenge.prepare()
+    lines = [f"Daily words for {challenge.day}:"]
+    for difficulty in DIFFICULTIES:
+        played = " (played)" if (message.from_user.id, difficulty) in challenge.played else ""
+        lines.append(f"{difficulty.capitalize()}: {challenge.puzzles[difficulty].board}{played}")
+    top = challenge.leaderboard.top(5)
+    if top:
+        lines.append("\nToday's top players:")
+        lines.extend(f"{rank}. {player_name}: {points}" for rank, (player_name, points) in enumerate(top, start=1))
+    standing = challenge.standing(message.from_user.id)
+    if standing is not None:
+        points, rank, total = standing
+        lines.append(f"\nYou have {points} points today, #{rank} of {total} players.")
+    if message.chat.type == ChatType.PRIVATE:
+        await message.reply('\n'.join(lines), reply_markup=kb.daily)
+    else:
+        lines.append("\nPlay the daily words in a private chat with the bot.")
+        await message.reply('\n'.join(lines))
+
+
+@router.callback_query(F.data.in_(['daily_easy', 'daily_medium', 'daily_hard']))
+async def start_daily_game(callback: CallbackQuery, state: FSMContext, bot: Bot):
+    difficulty = callback.data[len('daily_'):]
+    logging.info(f"User {callback.from_user.id} started the daily {difficulty} game")
+    game = await HangmanGame.create_daily(callback.message.chat.first_name, callback.message.chat.id, difficulty)
+    if game is None:
+        await callback.answer(f"You've already played today's {difficulty} word. Come back tomorrow!")
+        return
+    await callback.message.reply(f"Starting today's {difficulty} word...")
+    await close_prompt(callback)
+    await state.set_state(GameStates.playing)
+    await game.start_game(bot)
+    await end_turn(state, game, bot)
 
 
 @router.message(Command('word'))
@@ -67,13 +180,12 @@ async def cmd_word(message: Message):
         await message.reply(
             'After the /word command, write the word whose definition you would like to know. i.e. /word <word>')
     if result:
-        await message.answer('Definitions:')
-        for i in range(len(result['definitions'])):
-            await message.answer(f"{i + 1}) {result['definitions'][i]}")
+        lines = ['Definitions:']
+        lines.extend(f"{i + 1}) {definition}" for i, definition in enumerate(result['definitions']))
         if result['examples']:
-            await message.answer('Examples:')
-            for i in range(len(result['examples'])):
-                await message.answer(f"{i + 1}) {result['examples'][i]}")
+            lines.append('Examples:')
+            lines.extend(f"{i + 1}) {example}" for i, example in enumerate(result['examples']))
+        await message.answer('\n'.join(lines))
 
 
 @router.callback_query(F.data.in_(['get_hint', 'no_get_hint']))
@@ -81,15 +193,15 @@ async def cmd_hint(callback: CallbackQuery, state: FSMContext, bot: Bot):
     choice = callback.data
     logging.info(f"User {callback.from_user.id} chose {choice} for hint")
     if choice == 'get_hint':
-        data = await state.get_data()
-        game: HangmanGame = data.get('game')
-        await callback.message.delete()
+        game = await load_game(state, callback.message.chat)
+        await close_prompt(callback)
         if game:
             await game.give_hint(bot)
+            await end_turn(state, game, bot)
         else:
             await callback.message.reply("Start the game first.")
     else:
-        await callback.message.delete()
+        await close_prompt(callback)
 
 
 @router.callback_query(F.data.in_(['get_definition', 'no_get_definition']))
@@ -97,15 +209,15 @@ async def cmd_definition(callback: CallbackQuery, state: FSMContext, bot: Bot):
     choice = callback.data
     logging.info(f"User {callback.from_user.id} chose {choice} for definition")
     if choice == 'get_definition':
-        data = await state.get_data()
-        game: HangmanGame = data.get('game')
-        await callback.message.delete()
+        game = await load_game(state, callback.message.chat)
+        await close_prompt(callback)
         if game:
             await game.give_definition(bot)
+            await end_turn(state, game, bot)
         else:
             await callback.message.reply("Start the game first")
     else:
-        await callback.message.delete()
+        await close_prompt(callback)
 
 
 @router.callback_query(F.data.in_(['play_again', 'no_play_again']))
@@ -113,12 +225,12 @@ async def handle_play_again(callback: CallbackQuery, state: FSMContext, bot: Bot
     choice = callback.data
     logging.info(f"User {callback.from_user.id} chose {choice} to play again")
     if choice == 'play_again':
-        data = await state.get_data()
-        game: HangmanGame = data.get('game')
-        await callback.message.delete()
+        game = await load_game(state, callback.message.chat)
+        await close_prompt(callback)
         if game:
             await game.reset_game_state()
             await game.start_game(bot)
+            await end_turn(state, game, bot)
     elif choice == 'no_play_again':
         await state.clear()
         await callback.message.edit_text("Maybe next time! Use /play to start a new game.")
@@ -128,16 +240,17 @@ async def handle_play_again(callback: CallbackQuery, state: FSMContext, bot: Bot
 async def adding_word_to_database(callback: CallbackQuery, state: FSMContext, bot: Bot):
     choice = callback.data
     logging.info(f"User {callback.from_user.id} chose {choice} to add word to database")
-    data = await state.get_data()
-    game: HangmanGame = data.get('game')
+    game = await load_game(state, callback.message.chat)
     if choice == 'word_to_database':
-        await callback.message.delete()
+        await close_prompt(callback)
         if game:
             await game.add_word(bot)
+            await end_turn(state, game, bot)
     else:
-        await callback.message.delete()
+        await close_prompt(callback)
         if game:
             await game.resetting_game(bot)
+            await game.flush(bot)
 
 
 @router.message(Command('me'))
@@ -146,9 +259,11 @@ async def cmd_me(message: Message):
     if message.chat.type == ChatType.PRIVATE:
         player_id = message.from_user.id
         player_name = message.chat.first_name
-        score = await bd.get_score(player_id)
-        if score is not None:
-            await message.reply(f"Hello, {player_name}! Your current score is: {score}")
+        result = await bd.get_rank(player_id)
+        if result is not None:
+            score, rank, total = result
+            await message.reply(f"Hello, {player_name}! Your current score is: {score}\n"
+                                f"You are #{rank} of {total} players.")
         else:
             await message.reply(f"Hello, {player_name}! You don't have a score yet.")
     else:
@@ -174,19 +289,34 @@ async def cmd_top(message: Message):
 async def cmd_vocabulary(message: Message):
     logging.info(f"User {message.from_user.id} called /vocabulary")
     if message.chat.type == ChatType.PRIVATE:
-        result = await bd.get_player_words(message.chat.id)
-        if result:
-            await message.answer(result)
-        else:
+        has_words = False
+        async for words in bd.iter_player_words(message.chat.id):
+            has_words = True
+            await message.answer(', '.join(words))
+        if not has_words:
             await message.reply("Sorry, you don't have any words yet.")
     else:
         await message.reply("You can only view all your saved words via private bot messages :)")
 
 
-@router.message(GameStates.playing)
+@router.message(Command('guess'), GameStates.playing)
+async def cmd_guess(message: Message, command: CommandObject, state: FSMContext, bot: Bot):
+    if command.args:
+        await private_guess(message, state, bot, command.args.strip())
+    else:
+        await message.reply("Write your guess after the command, i.e. /guess <letter or word>")
+
+
+# Commands are never guesses, an unknown one sent during a game is ignored
+@router.message(GameStates.playing, ~F.text.startswith('/'))
 async def guess_letter_or_word(message: Message, state: FSMContext, bot: Bot):
-    data = await state.get_data()
-    logging.info(f"User {message.from_user.id} guessed: {message.text}")
-    game: HangmanGame = data.get('game')
+    await private_guess(message, state, bot, message.text)
+
+
+async def private_guess(message: Message, state: FSMContext, bot: Bot, guess: str) -> None:
+    guess_log.info(f"User {message.from_user.id} guessed: {guess}",
+                   extra={'user_id': message.from_user.id, 'guess': guess})
+    game = await load_game(state, message.chat)
     if game:
-        await game.handle_guess(bot, message.text.lower())
+        await game.handle_guess(bot, guess.lower())
+        await end_turn(state, game, bot)
@@ -19,3 +19,7 @@ hint = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text='Yes', c
 word_database = InlineKeyboardMarkup(
     inline_keyboard=[[InlineKeyboardButton(text='Yes', callback_data='word_to_database'),
                       InlineKeyboardButton(text='No', callback_data='no_word_to_database')]])
+
+daily = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text='Easy', callback_data='daily_easy'),
+                                               InlineKeyboardButton(text='Medium', callback_data='daily_medium'),
+                                               InlineKeyboardButton(text='Hard', callback_data='daily_hard')]])
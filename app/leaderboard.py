@@ -0,0 +1,89 @@
+import time
+from bisect import bisect_right, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TOP_SIZE = 10
+
+
+class Leaderboard:
+    """In-memory top-N and score histogram kept in step with the scores table.
+
+    ``load`` fills it from the database once; afterwards ``record`` applies every score
+    change incrementally. When a top player drops below players that are not tracked,
+    the top list is marked stale and must be reloaded from the score index. With
+    ``max_age`` set (several processes writing scores), it also goes stale over time.
+    """
+
+    def __init__(self, size: int = TOP_SIZE, max_age: Optional[float] = None):
+        self.size = size
+        self.max_age = max_age
+        self.loaded = False
+        self.loaded_at = 0.0
+        self.top_stale = True
+        self._top: List[Tuple[int, int, str]] = []  # (score, player_id, name), best first
+        self._counts: Dict[int, int] = {}
+        self._scores: List[int] = []  # distinct scores, ascending
+        self._total = 0
+
+    def load(self, counts: Iterable[Tuple[int, int]], top: Iterable[Tuple[int, str, int]]) -> None:
+        self._counts = dict(counts)
+        self._scores = sorted(self._counts)
+        self._total = sum(self._counts.values())
+        self.load_top(top)
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.max_age is not None and time.monotonic() - self.loaded_at >= self.max_age
+
+    def load_top(self, top: Iterable[Tuple[int, str, int]]) -> None:
+        self._top = [(score, player_id, name) for player_id, name, score in top][:self.size]
+        self.top_stale = False
+
+    def _add(self, score: int, delta: int) -> None:
+        count = self._counts.get(score, 0) + delta
+        if count > 0:
+            if score not in self._counts:
+                insort(self._scores, score)
+            self._counts[score] = count
+        elif score in self._counts:
+            del self._counts[score]
+            self._scores.pop(bisect_right(self._scores, score) - 1)
+        self._total += delta
+
+    def record(self, player_id: int, name: str, old_score: Optional[int], new_score: int) -> None:
+        if not self.loaded:
+            return
+        if old_score is not None:
+            self._add(old_score, -1)
+        self._add(new_score, 1)
+
+        if self.top_stale:
+            return
+        full = len(self._top) >= self.size
+        floor = self._top[-1][0] if self._top else None
+        was_top = False
+        for i, (_, top_id, top_name) in enumerate(self._top):
+            if top_id == player_id:
+                del self._top[i]
+                name = name or top_name
+                was_top = True
+                break
+        if was_top and full and new_score < floor:
+            # Someone we don't track may now outrank this player
+            self.top_stale = True
+            return
+        if was_top or not full or new_score > floor:
+            self._top.append((new_score, player_id, name))
+            self._top.sort(key=lambda entry: -entry[0])
+            del self._top[self.size:]
+
+    def top(self, limit: int) -> List[Tuple[str, int]]:
+        return [(name, score) for score, _, name in self._top[:limit]]
+
+    def rank(self, score: int) -> Tuple[int, int]:
+        """Return (1-based rank of ``score``, number of ranked players)."""
+        start = bisect_right(self._scores, score)
+        higher = sum(self._counts[s] for s in self._scores[start:])
+        return higher + 1, self._total
@@ -0,0 +1,47 @@
+import asyncio
+import logging
+import time
+
+from aiogram import Dispatcher
+
+import app.db as bd
+import app.oxford_api as ox
+from app import settings
+from app.daily import challenge
+from app.metrics import Exporter
+from app.multiplayer import groups
+from app.server_logs import setup_logging, stop_logging
+from app.words import bank
+
+
+async def on_startup(exporter: Exporter) -> None:
+    started = time.perf_counter()
+    setup_logging(settings.LOG_FILE, settings.LOG_LEVEL, settings.LOG_MAX_BYTES, settings.LOG_ROTATE_INTERVAL,
+                  settings.LOG_BACKUPS, settings.LOG_GUESS_SAMPLE_RATE)
+    # Done here, off the event loop, so the first update doesn't pay for them
+    await asyncio.gather(asyncio.get_running_loop().run_in_executor(None, bank.ensure_loaded), bd.db.open())
+    await exporter.start()
+    logging.info(f"Started in {time.perf_counter() - started:.3f}s")
+
+
+async def on_shutdown(exporter: Exporter) -> None:
+    await exporter.stop()
+    await groups.close()
+    await challenge.close()
+    await ox.client.close()
+    ox.cache.close()
+    await bd.db.close()
+    stop_logging()
+
+
+def setup(dp: Dispatcher) -> None:
+    """Create resources on startup and release them on shutdown.
+
+    Nothing is opened at import time: the database, word lists, dictionary session
+    and metrics exporter are created here or on first use.
+    """
+    # Webhook workers serve /metrics themselves, so only polling needs a separate port
+    dp['exporter'] = Exporter(settings.METRICS_PORT if settings.BOT_MODE != 'webhook' else None,
+                              settings.METRICS_LOG_INTERVAL)
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
@@ -0,0 +1,53 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Pattern, Tuple
+
+SUFFIXES = ('s', 'es', 'ed', 'd', 'ing', 'er', 'ers', 'est', 'ly', 'ness')
+VOWEL_SUFFIXES = ('es', 'ed', 'ing', 'er', 'ers', 'est')
+Y_SUFFIXES = ('es', 'ed', 'er', 'ers', 'est', 'ly', 'ness')
+VOWELS = set('aeiou')
+MIN_STEM_LENGTH = 3
+
+
+def stems(word: str) -> List[Tuple[str, Tuple[str, ...], bool]]:
+    """Forms of ``word`` as (stem, suffixes it takes, whether the stem alone is a match).
+
+    Only the word itself matches without a suffix: the stems made by dropping an 'e'
+    or changing 'y' to 'i' can be other words ("hope" -> "hop"), so they need one.
+    """
+    word = word.lower()
+    forms = [(word, SUFFIXES, True)]
+    if len(word) > MIN_STEM_LENGTH:
+        if word.endswith('e'):
+            forms.append((word[:-1], VOWEL_SUFFIXES, False))  # make -> making
+        elif word.endswith('y') and word[-2] not in VOWELS:
+            forms.append((word[:-1] + 'i', Y_SUFFIXES, False))  # carry -> carried, happy -> happily
+    if word[-1:].isalpha() and word[-1] not in VOWELS and word[-2:-1] in VOWELS:
+        forms.append((word + word[-1], VOWEL_SUFFIXES, False))  # run -> running
+    return sorted(forms, key=lambda form: len(form[0]), reverse=True)
+
+
+@lru_cache(maxsize=4096)
+def mask_pattern(word: str) -> Pattern:
+    """One case-insensitive pattern matching ``word`` and its common inflections as whole words."""
+    forms = '|'.join(f"{re.escape(stem)}(?:{'|'.join(suffixes)}){'?' if bare else ''}"
+                     for stem, suffixes, bare in stems(word))
+    return re.compile(rf"\b(?:{forms})\b", re.IGNORECASE)
+
+
+def _underscores(match: 're.Match') -> str:
+    return '_' * len(match.group())
+
+
+def mask(text: str, word: str) -> str:
+    """Replace every occurrence of ``word`` in ``text`` with underscores of the same length."""
+    return mask_pattern(word).sub(_underscores, text)
+
+
+def mask_page(word: str, page: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Masked copies of a page's definitions and examples, for showing during a game."""
+    pattern = mask_pattern(word)
+    return {
+        'masked_definitions': [pattern.sub(_underscores, text) for text in page['definitions']],
+        'masked_examples': [pattern.sub(_underscores, text) for text in page['examples']],
+    }
@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from aiohttp import web
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ACTIVE_GAME_WINDOW = 30 * 60  # seconds without a move after which a game no longer counts as active
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{value}"' for name, value in zip(names, values))
+    return f'{{{pairs}}}'
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for labels, value in self.values.items():
+            lines.append(f'{self.name}{_labels(self.label_names, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self.buckets = buckets
+        # labels -> [count per bucket (last one is +Inf), sum]
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def time(self, *labels: str) -> '_Timer':
+        return _Timer(self, labels)
+
+    def quantile(self, q: float, *labels: str) -> Optional[float]:
+        """Upper bound of the bucket holding the ``q`` quantile."""
+        series = self.values.get(labels)
+        if not series:
+            return None
+        counts = series[0]
+        target = q * sum(counts)
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float('inf')
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        names = self.label_names + ('le',)
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{_labels(names, labels + (le,))} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, labels)} {total}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, labels)} {cumulative}')
+        return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+class ActivityGauge:
+    """Number of keys touched within ``window`` seconds."""
+
+    def __init__(self, name: str, documentation: str, window: float):
+        self.name = name
+        self.documentation = documentation
+        self.window = window
+        self.last_seen: Dict[int, float] = {}
+
+    def touch(self, key: int) -> None:
+        self.last_seen[key] = time.monotonic()
+
+    def discard(self, key: int) -> None:
+        self.last_seen.pop(key, None)
+
+    @property
+    def value(self) -> int:
+        cutoff = time.monotonic() - self.window
+        self.last_seen = {key: seen for key, seen in self.last_seen.items() if seen >= cutoff}
+        return len(self.last_seen)
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge',
+                f'{self.name} {self.value}']
+
+
+HANDLER_LATENCY = Histogram('hangman_handler_seconds', 'Time spent in update handlers', ('handler',))
+HANDLER_ERRORS = Counter('hangman_handler_errors_total', 'Update handlers that raised', ('handler',))
+DB_LATENCY = Histogram('hangman_db_seconds', 'Database reads and writes, including queueing', ('op', 'kind'))
+API_LATENCY = Histogram('hangman_bot_api_seconds', 'Bot API requests, including rate limiting', ('method',))
+API_ERRORS = Counter('hangman_bot_api_errors_total', 'Failed Bot API requests', ('method',))
+DICTIONARY_LATENCY = Histogram('hangman_dictionary_fetch_seconds', 'Dictionary page downloads and parsing')
+DICTIONARY_ERRORS = Counter('hangman_dictionary_errors_total', 'Failed dictionary lookups')
+THROTTLED_UPDATES = Counter('hangman_throttled_updates_total', 'Updates dropped before reaching a handler',
+                            ('reason',))
+CACHE_LOOKUPS = Counter('hangman_definition_cache_total', 'Definition cache lookups by outcome', ('result',))
+ACTIVE_GAMES = ActivityGauge('hangman_active_games', 'Single-player and group games with a move in the last 30 minutes',
+                             ACTIVE_GAME_WINDOW)
+
+REGISTRY = [HANDLER_LATENCY, HANDLER_ERRORS, DB_LATENCY, API_LATENCY, API_ERRORS, DICTIONARY_LATENCY,
+            DICTIONARY_ERRORS, THROTTLED_UPDATES, CACHE_LOOKUPS, ACTIVE_GAMES]
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def summary() -> Dict[str, Any]:
+    """Compact snapshot for the periodic log dump."""
+    handlers = {}
+    for (handler,), (counts, total) in HANDLER_LATENCY.values.items():
+        handlers[handler] = {'count': sum(counts), 'p50': HANDLER_LATENCY.quantile(0.5, handler),
+                             'p99': HANDLER_LATENCY.quantile(0.99, handler)}
+    return {
+        'active_games': ACTIVE_GAMES.value,
+        'handlers': handlers,
+        'handler_errors': sum(HANDLER_ERRORS.values.values()),
+        'api_errors': sum(API_ERRORS.values.values()),
+        'throttled': {reason: count for (reason,), count in THROTTLED_UPDATES.values.items()},
+        'cache': {result: count for (result,), count in CACHE_LOOKUPS.values.items()},
+    }
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Inner middleware timing every matched handler and counting the ones that raise."""
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        handler_object = data.get('handler')
+        name = handler_object.callback.__name__ if handler_object is not None else 'unknown'
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, name)
+
+
+async def metrics_view(request: web.Request) -> web.Response:
+    return web.Response(text=render(), content_type='text/plain', charset='utf-8')
+
+
+class Exporter:
+    """Serves /metrics on its own port and/or dumps a summary to the log periodically."""
+
+    def __init__(self, port: Optional[int], log_interval: Optional[float], host: str = '0.0.0.0'):
+        self.port = port
+        self.log_interval = log_interval
+        self.host = host
+        self._runner: Optional[web.AppRunner] = None
+        self._dump_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self.port:
+            app = web.Application()
+            app.router.add_get('/metrics', metrics_view)
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            await web.TCPSite(self._runner, self.host, self.port).start()
+            logging.info(f"Serving metrics on port {self.port}")
+        if self.log_interval:
+            self._dump_task = asyncio.create_task(self._dump_loop())
+
+    async def _dump_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.log_interval)
+            logging.getLogger('hangman.metrics').info('metrics', extra={'metrics': summary()})
+
+    async def stop(self) -> None:
+        if self._dump_task is not None:
+            self._dump_task.cancel()
+            self._dump_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+
+import app.db as bd
+from app import engine
+from app.game_state import GameState, mask_letters
+from app.metrics import ACTIVE_GAMES
+from app.word_selector import selector
+
+TICK = 3.0  # seconds between board edits, Telegram allows about 20 messages a minute per group
+IDLE_TIMEOUT = 10 * 60  # seconds without a guess before a group game is abandoned
+RECENT_EVENTS = 5  # guesses listed under the board
+TOP_PLAYERS = 5
+WRONG_GUESS_POINTS = -1
+
+
+class Member:
+    __slots__ = ('name', 'points', 'unsaved')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.points = 0
+        self.unsaved = 0
+
+
+class GroupGame:
+    """One word shared by everybody in a group chat.
+
+    Guesses are applied under the game's lock as they arrive; the board message is
+    only edited by the ticker, at most once per tick, however many guesses came in.
+    Wrong guesses cost points in this game only, they never reach the saved scores.
+    """
+
+    def __init__(self, chat_id: int, state: GameState, board_message_id: int):
+        self.chat_id = chat_id
+        self.state = state
+        self.board_message_id = board_message_id
+        self.lock = asyncio.Lock()
+        self.players: Dict[int, Member] = {}
+        self.events: Deque[str] = deque(maxlen=RECENT_EVENTS)
+        self.dirty = False
+        self.publishing = False  # a publish for this game is in flight
+        self.outcome: Optional[str] = None
+        self.winner: Optional[str] = None
+        self.last_guess = time.monotonic()
+
+    def player(self, user_id: int, name: str) -> Member:
+        player = self.players.get(user_id)
+        if player is None:
+            player = self.players[user_id] = Member(name)
+        return player
+
+    def credit(self, player: Member, points: int) -> None:
+        player.points += points
+        player.unsaved += points
+
+    def guess(self, user_id: int, name: str, text: str, casual: bool = False) -> Optional[str]:
+        """Apply a guess and return its outcome, or ``None`` if the text isn't a guess.
+
+        A ``casual`` message is one sent to the chat rather than as a guess; it only
+        counts when it is the word itself, so conversation never costs a wrong guess.
+        """
+        if self.outcome is not None:
+            return None
+        if casual and text != self.state.word:
+            return None
+        before = self.state.guessed
+        if len(text) == 1:
+            outcome = engine.guess_letter(self.state, text)
+        elif len(text) == len(self.state.word):
+            outcome = engine.guess_word(self.state, text)
+        else:
+            return None  # ordinary chat
+        if outcome == engine.NOT_A_LETTER:
+            return None
+        if outcome in (engine.ALREADY_GUESSED, engine.ALREADY_WRONG):
+            return outcome
+
+        player = self.player(user_id, name)
+        self.last_guess = time.monotonic()
+        self.dirty = True
+        if outcome in (engine.HIT, engine.WON):
+            found = self.state.guessed & ~before
+            self.credit(player, sum(len(self.state.info.positions[bit])
+                                    for bit in self.state.info.positions if found & bit))
+            self.events.append(f"{name}: {text} +")
+        else:
+            player.points += WRONG_GUESS_POINTS
+            self.events.append(f"{name}: {text} -")
+        if outcome == engine.WON:
+            self.credit(player, engine.points(self.state))
+            self.winner = name
+        if outcome in (engine.WON, engine.LOST):
+            self.outcome = outcome
+        return outcome
+
+    def render(self) -> str:
+        lines = [self.state.display_word()]
+        max_wrong = engine.MAX_WRONG_GUESSES[self.state.difficulty]
+        wrong = f"Wrong guesses: {self.state.wrong_guesses}/{max_wrong}"
+        if self.state.wrong:
+            wrong += f" ({' '.join(mask_letters(self.state.wrong))})"
+        lines.append(wrong)
+        if self.events:
+            lines.append('')
+            lines.extend(self.events)
+        if self.players:
+            top = sorted(self.players.values(), key=lambda player: player.points, reverse=True)[:TOP_PLAYERS]
+            lines.append('')
+            lines.append('Points: ' + ', '.join(f"{player.name} {player.points}" for player in top))
+        return '\n'.join(lines)
+
+    def results(self) -> str:
+        if self.outcome == engine.WON:
+            header = f"{self.winner} guessed the word: {self.state.word}"
+        elif self.outcome == engine.LOST:
+            header = f"Out of guesses! The word was: {self.state.word}"
+        else:
+            header = f"Game abandoned. The word was: {self.state.word}"
+        ranking = sorted(self.players.values(), key=lambda player: player.points, reverse=True)
+        lines = [header]
+        lines.extend(f"{i + 1}. {player.name}: {player.points:+d}" for i, player in enumerate(ranking))
+        lines.append('Use /play to start another round.')
+        return '\n'.join(lines)
+
+
+class GroupGames:
+    """Active group games and the ticker that publishes them.
+
+    Games live in this process's memory. With several webhook workers an update for
+    a group may reach a worker that doesn't hold its game, so group play needs a
+    single worker and is switched off with ``enabled`` otherwise.
+
+    Every tick publishes each game in its own task, so a group held back by the
+    rate limiter doesn't delay the others. Points move from finished and running
+    games to a queue that is written each tick and keeps what failed to save.
+    """
+
+    def __init__(self, tick: float = TICK, idle_timeout: float = IDLE_TIMEOUT):
+        self.tick = tick
+        self.idle_timeout = idle_timeout
+        self.enabled = True
+        self.games: Dict[int, GroupGame] = {}
+        self._unsaved: Dict[int, List] = {}  # user_id -> [name, points] not written yet
+        self._saver: Optional[asyncio.Task] = None
+        self._bot: Optional[Bot] = None
+        self._ticker: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def get(self, chat_id: int) -> Optional[GroupGame]:
+        return self.games.get(chat_id)
+
+    async def start(self, bot: Bot, chat_id: int, difficulty: str) -> Optional[GroupGame]:
+        """Start a game in ``chat_id`` unless one is already running there."""
+        if chat_id in self.games:
+            return None
+        state = GameState.new(difficulty, await selector.pick(chat_id, difficulty))
+        if chat_id in self.games:
+            return None
+        game = self.games[chat_id] = GroupGame(chat_id, state, 0)
+        try:
+            message = await bot.send_message(chat_id, game.render())
+        except Exception:
+            del self.games[chat_id]
+            raise
+        game.board_message_id = message.message_id
+        ACTIVE_GAMES.touch(chat_id)
+        self._bot = bot
+        if self._ticker is None or self._ticker.done():
+            self._ticker = asyncio.create_task(self._run())
+        return game
+
+    async def guess(self, chat_id: int, user_id: int, name: str, text: str,
+                    casual: bool = False) -> Optional[str]:
+        game = self.games.get(chat_id)
+        if game is None:
+            return None
+        async with game.lock:
+            outcome = game.guess(user_id, name, text, casual)
+        if outcome is not None:
+            ACTIVE_GAMES.touch(chat_id)
+        return outcome
+
+    async def _run(self) -> None:
+        while self.games or self._unsaved or (self._saver is not None and not self._saver.done()):
+            await asyncio.sleep(self.tick)
+            for game in list(self.games.values()):
+                if not game.publishing:
+                    game.publishing = True
+                    task = asyncio.create_task(self.publish(game))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+            if self._unsaved and (self._saver is None or self._saver.done()):
+                self._saver = asyncio.create_task(self.save_points())
+
+    async def publish(self, game: GroupGame) -> None:
+        try:
+            async with game.lock:
+                if game.outcome is None and time.monotonic() - game.last_guess >= self.idle_timeout:
+                    game.outcome = 'abandoned'
+                text = game.render() if game.dirty else None
+                game.dirty = False
+                finished = game.outcome is not None
+                if finished:
+                    self.games.pop(game.chat_id, None)
+                    ACTIVE_GAMES.discard(game.chat_id)
+                self.collect(game)
+            if text is not None:
+                await self.edit_board(game, text)
+            if finished:
+                await self._bot.send_message(game.chat_id, game.results())
+        except Exception as e:
+            logging.error(f"Failed to publish the group game in chat {game.chat_id}: {e}")
+        finally:
+            game.publishing = False
+
+    async def edit_board(self, game: GroupGame, text: str) -> None:
+        try:
+            await self._bot.edit_message_text(text, chat_id=game.chat_id, message_id=game.board_message_id)
+        except TelegramBadRequest as e:
+            if 'not modified' in e.message:
+                return
+            logging.warning(f"Could not edit the group board in chat {game.chat_id}, sending a new one: {e}")
+            message = await self._bot.send_message(game.chat_id, text)
+            game.board_message_id = message.message_id
+
+    def collect(self, game: GroupGame) -> None:
+        """Queue the points earned in ``game`` since the last collection."""
+        for user_id, player in game.players.items():
+            if player.unsaved:
+                entry = self._unsaved.setdefault(user_id, [player.name, 0])
+                entry[1] += player.unsaved
+                player.unsaved = 0
+
+    async def save_points(self) -> None:
+        """Write the queued points; the writes share one commit and failed ones stay queued."""
+        unsaved, self._unsaved = self._unsaved, {}
+        results = await asyncio.gather(*(bd.save_score(user_id, name, points)
+                                         for user_id, (name, points) in unsaved.items()),
+                                       return_exceptions=True)
+        for (user_id, (name, points)), result in zip(unsaved.items(), results):
+            if isinstance(result, Exception):
+                logging.error(f"Failed to save {points} points for {user_id}, retrying next tick: {result}")
+                entry = self._unsaved.setdefault(user_id, [name, 0])
+                entry[1] += points
+
+    async def close(self) -> None:
+        # Board updates are dropped, but a save in flight is waited for so no points are lost
+        tasks = [task for task in [self._ticker, *self._tasks] if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, *[self._saver] if self._saver else [], return_exceptions=True)
+        self._ticker = self._saver = None
+        # Points are kept; the games themselves don't survive a restart
+        for game in self.games.values():
+            self.collect(game)
+            ACTIVE_GAMES.discard(game.chat_id)
+        self.games.clear()
+        await self.save_points()
+
+
+groups = GroupGames()
@@ -0,0 +1,108 @@
+import logging
+from typing import List, Optional
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+from aiogram.types import InlineKeyboardMarkup, Message
+
+from app.metrics import API_ERRORS, API_LATENCY
+from app.ratelimit import ChatRateLimiter
+
+MAX_ATTEMPTS = 3
+MESSAGE_LIMIT = 4096  # characters Telegram accepts in one text message
+RATE_LIMITED_PREFIXES = ('Send', 'Edit', 'Copy', 'Forward')
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """Schedules every outgoing message under Telegram's flood limits.
+
+    Installed on the bot session, so everything one bot sends shares its limiter.
+    The limiter only lives in this process: every other process sending with the
+    same token, such as weekly_notification.py, has its own, and their global rates
+    together have to stay under Telegram's limit. Requests rejected with ``retry_after`` are retried after
+    their chat has been paused for that long; a ``retry_after`` on a request not
+    addressed to one chat pauses every chat. Send latency, including time spent
+    waiting for the limiter, is recorded per method.
+    """
+
+    def __init__(self, limiter: Optional[ChatRateLimiter] = None):
+        self.limiter = limiter or ChatRateLimiter()
+
+    async def __call__(self, make_request: NextRequestMiddlewareType[TelegramType], bot: Bot,
+                       method: TelegramMethod[TelegramType]) -> Response[TelegramType]:
+        chat_id = getattr(method, 'chat_id', None)
+        name = type(method).__name__
+        if not isinstance(chat_id, int):
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                logging.warning(f"Flood limit hit on {name}, pausing all chats for {e.retry_after}s")
+                self.limiter.pause_all(e.retry_after)
+                raise
+        if not name.startswith(RATE_LIMITED_PREFIXES):
+            return await make_request(bot, method)
+
+        try:
+            with API_LATENCY.time(name):
+                return await self._send(make_request, bot, method, chat_id)
+        except Exception:
+            API_ERRORS.inc(name)
+            raise
+
+    async def _send(self, make_request: NextRequestMiddlewareType[TelegramType], bot: Bot,
+                    method: TelegramMethod[TelegramType], chat_id: int) -> Response[TelegramType]:
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            await self.limiter.acquire(chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == MAX_ATTEMPTS:
+                    raise
+                logging.warning(f"Flood limit hit for chat {chat_id}, retrying in {e.retry_after}s")
+                self.limiter.pause(chat_id, e.retry_after)
+
+
+class Outbox:
+    """Collects what a game says during one turn and sends it as a single message.
+
+    The keyboard of the last prompt added is attached to the merged message.
+    """
+    __slots__ = ('chat_id', 'lines', 'reply_markup')
+
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self.lines: List[str] = []
+        self.reply_markup: Optional[InlineKeyboardMarkup] = None
+
+    def add(self, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None) -> None:
+        self.lines.append(text)
+        if reply_markup is not None:
+            self.reply_markup = reply_markup
+
+    def _chunks(self) -> List[str]:
+        chunks = []
+        current = ''
+        for line in self.lines:
+            if current and len(current) + 1 + len(line) > MESSAGE_LIMIT:
+                chunks.append(current)
+                current = ''
+            current = f"{current}\n{line}" if current else line
+        if current:
+            chunks.append(current)
+        return chunks
+
+    async def flush(self, bot: Bot) -> Optional[Message]:
+        if not self.lines:
+            return None
+        chunks = self._chunks()
+        reply_markup = self.reply_markup
+        self.lines = []
+        self.reply_markup = None
+        message = None
+        for i, chunk in enumerate(chunks):
+            message = await bot.send_message(self.chat_id, chunk,
+                                             reply_markup=reply_markup if i == len(chunks) - 1 else None)
+        return message
@@ -1,42 +1,114 @@
-import requests
+import asyncio
 import logging
-from bs4 import BeautifulSoup
+from typing import Dict, List, Optional
 
+import aiohttp
 
-async def get_data(word, blurred):
-    url = f"https://www.oxfordlearnersdictionaries.com/definition/english/{word}"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/94.0.4606.81 Safari/537.36'
+from app.definition_cache import MISSING, cache
+from app.masking import mask_page
+from app.metrics import DICTIONARY_ERRORS, DICTIONARY_LATENCY
+
+BASE_URL = "https://www.oxfordlearnersdictionaries.com/definition/english/"
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/94.0.4606.81 Safari/537.36'
+}
+REQUEST_TIMEOUT = 10  # seconds for a whole lookup
+CONNECT_TIMEOUT = 3
+MAX_CONCURRENT_REQUESTS = 8
+POOL_SIZE = 16
+KEEPALIVE_TIMEOUT = 30
+
+
+def parse_page(content: bytes) -> Dict[str, List[str]]:
+    # Imported here so processes that never look a word up don't pay for it
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, 'html.parser')
+    return {
+        'definitions': [definition.text.strip() for definition in soup.find_all(class_='def')],
+        'examples': [example.text.strip() for example in soup.find_all(class_='x')],
     }
 
+
+class DictionaryClient:
+    """Fetches dictionary pages over a shared keep-alive connection pool.
+
+    At most ``max_concurrent`` lookups hit the site at once; HTML parsing runs in
+    the default executor so it never blocks the event loop.
+    """
+
+    def __init__(self, base_url: str = BASE_URL, max_concurrent: int = MAX_CONCURRENT_REQUESTS,
+                 timeout: float = REQUEST_TIMEOUT, connect_timeout: float = CONNECT_TIMEOUT,
+                 pool_size: int = POOL_SIZE):
+        self.base_url = base_url
+        self.max_concurrent = max_concurrent
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.pool_size = pool_size
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=KEEPALIVE_TIMEOUT)
+            self._session = aiohttp.ClientSession(connector=connector, headers=HEADERS, timeout=self.timeout)
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._session
+
+    async def fetch(self, word: str) -> Optional[Dict[str, List[str]]]:
+        """Return every definition and example for ``word``, or ``None`` if the site has no entry."""
+        session = self._get_session()
+        async with self._semaphore:
+            async with session.get(f"{self.base_url}{word}") as response:
+                if response.status == 404:
+                    return None
+                response.raise_for_status()
+                content = await response.read()
+        return await asyncio.get_running_loop().run_in_executor(None, parse_page, content)
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+client = DictionaryClient()
+
+
+async def get_page(word: str) -> Optional[Dict[str, List[str]]]:
+    page = await cache.get(word)
+    if page is not MISSING:
+        return page
+    with DICTIONARY_LATENCY.time():
+        page = await client.fetch(word)
+    await cache.put(word, page)
+    return page
+
+
+async def get_data(word, blurred):
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        definitions = []
-        for definition in soup.find_all(class_='def'):
-            if blurred:
-                definitions.append(definition.text.strip().lower().replace(word, '_' * len(word)).replace(word[:-1], '_' * len(word[:-1])).replace(word[:-2], '_' * len(word[:-2])))
-            else:
-                definitions.append(definition.text.strip())
-
-        examples = []
-        for example in soup.find_all(class_='x'):
-            if blurred:
-                example_text = example.text.strip().lower().replace(word, '_' * len(word)).replace(word[:-1], '_' * len(word[:-1])).replace(word[:-2], '_' * len(word[:-2]))
-            else:
-                example_text = example.text.strip()
-            examples.append(example_text)
-
-        return {
-            'definitions': definitions[:2] if definitions else None,
-            'examples': examples[:2] if examples else None
-        }
-
-    except requests.exceptions.RequestException as e:
+        page = await get_page(word)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        DICTIONARY_ERRORS.inc()
         logging.error(f"Error retrieving data for word '{word}': {e}")
         return None
     except Exception as e:
+        DICTIONARY_ERRORS.inc()
         logging.error(f"Unexpected error retrieving data for word '{word}': {e}")
         return None
+
+    if page is None:
+        logging.info(f"No dictionary entry for word '{word}'")
+        return None
+
+    if blurred:
+        if 'masked_definitions' not in page:
+            page = mask_page(word, page)  # cached before masked copies were stored
+        definitions = page['masked_definitions'][:2]
+        examples = page['masked_examples'][:2]
+    else:
+        definitions = page['definitions'][:2]
+        examples = page['examples'][:2]
+
+    return {
+        'definitions': definitions or None,
+        'examples': examples or None
+    }
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from typing import Dict
+
+# Telegram's documented flood limits
+GLOBAL_RATE = 25.0  # messages per second across all chats (the hard limit is about 30)
+PRIVATE_CHAT_RATE = 1.0  # messages per second to one private chat
+GROUP_CHAT_RATE = 20 / 60  # messages per second to one group
+CHAT_BURST = 3
+MAX_IDLE_BUCKETS = 10000
+
+
+class TokenBucket:
+    """Token bucket that lets callers reserve a token and sleep until it is theirs.
+
+    Tokens may go negative: every ``acquire`` takes one immediately and waits out the
+    debt, so waiters are served in arrival order without polling.
+    """
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Take ``tokens`` now and return how many seconds the caller must wait before using them."""
+        self._refill()
+        self.tokens -= tokens
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    async def acquire(self, tokens: float = 1) -> None:
+        delay = self.reserve(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """Withhold tokens for ``seconds``, e.g. after Telegram answered with retry_after."""
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+    @property
+    def idle(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class ChatRateLimiter:
+    """Keeps outgoing messages under Telegram's global and per-chat limits."""
+
+    def __init__(self, global_rate: float = GLOBAL_RATE, private_rate: float = PRIVATE_CHAT_RATE,
+                 group_rate: float = GROUP_CHAT_RATE, burst: float = CHAT_BURST):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.private_rate = private_rate
+        self.group_rate = group_rate
+        self.burst = burst
+        self._chats: Dict[int, TokenBucket] = {}
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_IDLE_BUCKETS:
+                # A full bucket carries no state worth keeping
+                self._chats = {key: value for key, value in self._chats.items() if not value.idle}
+            rate = self.group_rate if chat_id < 0 else self.private_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, self.burst)
+        return bucket
+
+    async def acquire(self, chat_id: int) -> None:
+        await self._chat_bucket(chat_id).acquire()
+        await self.global_bucket.acquire()
+
+    def pause(self, chat_id: int, seconds: float) -> None:
+        """Hold back one chat after Telegram flood-limited it; other chats keep sending."""
+        self._chat_bucket(chat_id).pause(seconds)
+
+    def pause_all(self, seconds: float) -> None:
+        """Hold back every chat after a flood limit that isn't tied to one chat."""
+        self.global_bucket.pause(seconds)
@@ -1 +1,135 @@
-
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import random
+import time
+from typing import Optional
+
+GUESS_LOGGER = 'hangman.guesses'
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+guess_log = logging.getLogger(GUESS_LOGGER)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the standard fields plus any ``extra`` ones."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotates when the file reaches ``max_bytes`` or every ``interval`` seconds, whichever is first."""
+
+    def __init__(self, filename: str, max_bytes: int, interval: float, backup_count: int):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self.interval = interval
+        try:
+            opened_at = os.stat(filename).st_mtime
+        except OSError:
+            opened_at = time.time()
+        self.rollover_at = opened_at + interval
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.interval and time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only ``rate`` of the records from the per-guess logger."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.name != GUESS_LOGGER or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_pid = 0
+_queue_handler: Optional[logging.Handler] = None
+
+
+def worker_filename(filename: str) -> str:
+    """Log file of this process: worker processes get their own so they never rotate each other's."""
+    if multiprocessing.parent_process() is None:
+        return filename
+    base, ext = os.path.splitext(filename)
+    return f"{base}.{multiprocessing.current_process().name}{ext}"
+
+
+def setup_logging(filename: str, level: str = 'INFO', max_bytes: int = 10 * 1024 * 1024,
+                  interval: float = 24 * 3600, backup_count: int = 7, guess_sample_rate: float = 1.0) -> None:
+    """Route all logging through a queue to a background thread that writes JSON lines.
+
+    Handlers on the event loop only put records on an in-memory queue; formatting,
+    writing and rotation happen on the listener thread. Calling it again is a no-op,
+    except in a forked worker, which does not inherit the thread and starts its own.
+    Worker processes write to their own file, e.g. ``logs.webhook-0.txt``.
+    """
+    global _listener, _listener_pid, _queue_handler
+    if _listener is not None and _listener_pid == os.getpid():
+        return
+    file_handler = SizeAndTimeRotatingFileHandler(worker_filename(filename), max_bytes, interval, backup_count)
+    file_handler.setFormatter(JsonFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(guess_sample_rate))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    inherited = _listener is not None
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener_pid = os.getpid()
+    _listener.start()
+    if not inherited:
+        atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the writer thread.
+
+    Called on shutdown: forked workers leave through ``os._exit``, which skips ``atexit``.
+    """
+    global _listener, _queue_handler
+    if _listener is None or _listener_pid != os.getpid():
+        return
+    # Later records go to logging's last-resort stderr handler instead of a queue nobody reads
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = _queue_handler = None
@@ -0,0 +1,51 @@
+# Optional settings read from config.py; only TOKEN is required there
+import config
+
+# FSM storage for active games: 'sqlite', 'redis' or 'memory'
+FSM_STORAGE = getattr(config, 'FSM_STORAGE', 'sqlite')
+FSM_DB_PATH = getattr(config, 'FSM_DB_PATH', 'fsm.db')
+FSM_TTL = getattr(config, 'FSM_TTL', 7 * 24 * 3600)  # seconds before an untouched game is dropped
+FSM_FLUSH_INTERVAL = getattr(config, 'FSM_FLUSH_INTERVAL', 0.05)  # seconds writes are coalesced for
+REDIS_URL = getattr(config, 'REDIS_URL', 'redis://localhost:6379/0')
+
+# How updates are received: 'polling' or 'webhook'
+BOT_MODE = getattr(config, 'BOT_MODE', 'polling')
+WEBHOOK_BASE_URL = getattr(config, 'WEBHOOK_BASE_URL', None)  # public https URL Telegram posts to
+WEBHOOK_PATH = getattr(config, 'WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = getattr(config, 'WEBHOOK_SECRET', None)
+WEBHOOK_MAX_CONNECTIONS = getattr(config, 'WEBHOOK_MAX_CONNECTIONS', 40)
+WEB_HOST = getattr(config, 'WEB_HOST', '0.0.0.0')
+WEB_PORT = getattr(config, 'WEB_PORT', 8080)
+# More than one worker needs FSM_STORAGE = 'redis'. Group games then stay off, leaderboards are per
+# worker and reloaded every LEADERBOARD_MAX_AGE, metrics are served per worker (see METRICS_PORT),
+# each worker sends at GLOBAL_RATE / WEB_WORKERS and word histories are read from the database every pick
+WEB_WORKERS = getattr(config, 'WEB_WORKERS', 1)
+SHUTDOWN_TIMEOUT = getattr(config, 'SHUTDOWN_TIMEOUT', 30)  # seconds in-flight updates get to finish
+LEADERBOARD_MAX_AGE = getattr(config, 'LEADERBOARD_MAX_AGE', 10)  # seconds, with several workers
+
+# Messages per second weekly_notification.py sends; the running bot keeps sending up to
+# GLOBAL_RATE (app/ratelimit.py) meanwhile and both have to stay under Telegram's ~30/s
+BROADCAST_RATE = getattr(config, 'BROADCAST_RATE', 4.0)
+
+# Bot API server, e.g. a local telegram-bot-api instance or a mock in tests
+BOT_API_URL = getattr(config, 'BOT_API_URL', None)
+
+# 'edit' keeps one board message per game and edits it; 'send' posts the board with every reply
+BOARD_MODE = getattr(config, 'BOARD_MODE', 'edit')
+
+LOG_FILE = getattr(config, 'LOG_FILE', 'logs.txt')
+LOG_LEVEL = getattr(config, 'LOG_LEVEL', 'INFO')
+LOG_MAX_BYTES = getattr(config, 'LOG_MAX_BYTES', 10 * 1024 * 1024)
+LOG_ROTATE_INTERVAL = getattr(config, 'LOG_ROTATE_INTERVAL', 24 * 3600)  # seconds
+LOG_BACKUPS = getattr(config, 'LOG_BACKUPS', 7)
+LOG_GUESS_SAMPLE_RATE = getattr(config, 'LOG_GUESS_SAMPLE_RATE', 0.1)  # share of per-guess events logged
+
+# Prometheus text endpoint on its own port in polling mode; a single webhook worker serves /metrics on
+# WEB_PORT, several workers serve theirs on METRICS_PORT, METRICS_PORT + 1, ... (none without METRICS_PORT)
+METRICS_PORT = getattr(config, 'METRICS_PORT', None)
+METRICS_LOG_INTERVAL = getattr(config, 'METRICS_LOG_INTERVAL', None)  # seconds between metric summaries in the log
+
+# Per-user limits on incoming updates
+THROTTLE_RATE = getattr(config, 'THROTTLE_RATE', 2.0)  # updates per second
+THROTTLE_BURST = getattr(config, 'THROTTLE_BURST', 5)
+DUPLICATE_WINDOW = getattr(config, 'DUPLICATE_WINDOW', 1.0)  # seconds an identical update counts as a repeat
@@ -0,0 +1,199 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import SimpleEventIsolation
+
+from app import settings
+from app.db import Database
+
+SWEEP_INTERVAL = 3600  # seconds between deletions of expired games
+
+FSM_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS fsm (
+        key TEXT PRIMARY KEY,
+        state TEXT,
+        data TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_fsm_updated_at ON fsm (updated_at)',
+)
+
+_UNCHANGED = object()
+
+
+def _read_record(conn: sqlite3.Connection, key: str, expires_before: float):
+    return conn.execute('SELECT state, data FROM fsm WHERE key = ? AND updated_at >= ?',
+                        (key, expires_before)).fetchone()
+
+
+def _write_records(conn: sqlite3.Connection, records: List[Tuple[str, Any, Any, float]]) -> None:
+    for key, state, data, updated_at in records:
+        if state is _UNCHANGED:
+            conn.execute('INSERT INTO fsm (key, state, data, updated_at) VALUES (?, NULL, ?, ?) '
+                         'ON CONFLICT (key) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at',
+                         (key, data, updated_at))
+        elif data is _UNCHANGED:
+            conn.execute("INSERT INTO fsm (key, state, data, updated_at) VALUES (?, ?, '{}', ?) "
+                         'ON CONFLICT (key) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at',
+                         (key, state, updated_at))
+        else:
+            conn.execute('INSERT OR REPLACE INTO fsm (key, state, data, updated_at) VALUES (?, ?, ?, ?)',
+                         (key, state, data, updated_at))
+        # A cleared context leaves nothing worth keeping
+        conn.execute("DELETE FROM fsm WHERE key = ? AND state IS NULL AND data = '{}'", (key,))
+
+
+def _delete_expired(conn: sqlite3.Connection, expires_before: float) -> int:
+    return conn.execute('DELETE FROM fsm WHERE updated_at < ?', (expires_before,)).rowcount
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM storage persisted to SQLite, so games survive restarts.
+
+    Changes are held in memory for ``flush_interval`` seconds and written in one
+    batch; only keys with unflushed changes are served from memory, everything else
+    is read from the database. Because of that buffer, and because event isolation
+    is per process, a file must only be used by one bot process; several workers
+    need Redis. Records untouched for ``ttl`` seconds are treated as gone and swept
+    periodically.
+    """
+
+    def __init__(self, path: str, ttl: float, flush_interval: float):
+        self.db = Database(path, schema=FSM_SCHEMA, migrations=())
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._pending: Dict[str, list] = {}  # key -> [state, serialized data]
+        self._flushing: Dict[str, list] = {}  # the batch currently being committed
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._swept_at = 0.0
+
+    def _unflushed(self, record_key: str) -> Tuple[Any, Any]:
+        state = data = _UNCHANGED
+        # Newest first: changes made while a batch is being committed override it
+        for layer in (self._pending, self._flushing):
+            entry = layer.get(record_key)
+            if entry is not None:
+                state = entry[0] if state is _UNCHANGED else state
+                data = entry[1] if data is _UNCHANGED else data
+        return state, data
+
+    async def _get(self, key: StorageKey) -> Tuple[Optional[str], str]:
+        record_key = self.key_builder.build(key)
+        state, data = self._unflushed(record_key)
+        if state is not _UNCHANGED and data is not _UNCHANGED:
+            return state, data
+        row = await self.db.read(_read_record, record_key, time.time() - self.ttl)
+        stored_state, stored_data = row if row else (None, '{}')
+        return (stored_state if state is _UNCHANGED else state,
+                stored_data if data is _UNCHANGED else data)
+
+    async def _put(self, key: StorageKey, state: Any = _UNCHANGED, data: Any = _UNCHANGED) -> None:
+        record_key = self.key_builder.build(key)
+        pending = self._pending.setdefault(record_key, [_UNCHANGED, _UNCHANGED])
+        if state is not _UNCHANGED:
+            pending[0] = state
+        if data is not _UNCHANGED:
+            pending[1] = data
+        if not self.flush_interval:
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        # Keeps going while writes arrive during a flush, so none of them is left behind
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                # _flush put the batch back in _pending, so the next round writes it again
+                logging.error(f"Failed to persist FSM records, {len(self._pending)} stay queued: {e}")
+            if not self._pending:
+                return
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        if self._pending:
+            now = time.time()
+            records = [(key, state, data, now) for key, (state, data) in self._pending.items()]
+            # Writes arriving while the batch is being committed go to a fresh dict and the next
+            # flush; reads see the batch through _flushing until it is committed
+            self._flushing, self._pending = self._pending, {}
+            try:
+                await self.db.write(_write_records, records)
+            except Exception:
+                for key, (state, data) in self._flushing.items():
+                    entry = self._pending.setdefault(key, [_UNCHANGED, _UNCHANGED])
+                    entry[0] = state if entry[0] is _UNCHANGED else entry[0]
+                    entry[1] = data if entry[1] is _UNCHANGED else entry[1]
+                raise
+            finally:
+                self._flushing = {}
+        if time.monotonic() - self._swept_at >= SWEEP_INTERVAL:
+            self._swept_at = time.monotonic()
+            try:
+                expired = await self.db.write(_delete_expired, time.time() - self.ttl)
+            except Exception as e:
+                logging.error(f"Failed to sweep expired FSM records: {e}")
+            else:
+                if expired:
+                    logging.info(f"Dropped {expired} abandoned FSM records")
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._put(key, state=state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._get(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await self._put(key, data=json.dumps(dict(data), separators=(',', ':')))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._get(key)
+        return json.loads(data)
+
+    async def close(self) -> None:
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await self.flush()
+        except Exception as e:
+            logging.error(f"Failed to persist {len(self._pending)} FSM records on shutdown: {e}")
+        await self.db.close()
+
+
+def create_storage() -> BaseStorage:
+    if settings.FSM_STORAGE == 'sqlite':
+        return SQLiteStorage(settings.FSM_DB_PATH, settings.FSM_TTL, settings.FSM_FLUSH_INTERVAL)
+    if settings.FSM_STORAGE == 'redis':
+        from aiogram.fsm.storage.redis import RedisStorage
+        return RedisStorage.from_url(settings.REDIS_URL, state_ttl=settings.FSM_TTL, data_ttl=settings.FSM_TTL)
+    if settings.FSM_STORAGE == 'memory':
+        from aiogram.fsm.storage.memory import MemoryStorage
+        return MemoryStorage()
+    raise ValueError(f"Unknown FSM_STORAGE: {settings.FSM_STORAGE!r}")
+
+
+def create_events_isolation(storage: BaseStorage) -> BaseEventIsolation:
+    """Per-user update isolation matching the storage: Redis locks are shared by every worker."""
+    if settings.FSM_STORAGE == 'redis':
+        return storage.create_isolation()
+    return SimpleEventIsolation()
@@ -0,0 +1,92 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from app.metrics import THROTTLED_UPDATES
+from app.ratelimit import TokenBucket
+
+USER_RATE = 2.0  # updates per second a user can sustain
+USER_BURST = 5
+DUPLICATE_WINDOW = 1.0  # seconds within which an identical update counts as a repeat
+MAX_USERS = 10000  # tracked users before idle ones are forgotten
+
+SLOW_DOWN = "You're going too fast. Please slow down."
+
+
+class _UserState:
+    __slots__ = ('bucket', 'last_key', 'last_seen', 'warned')
+
+    def __init__(self, rate: float, burst: float):
+        self.bucket = TokenBucket(rate, burst)
+        self.last_key: Optional[Hashable] = None
+        self.last_seen = 0.0
+        self.warned = False
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Drops repeated and excessive updates from one user before any handler runs.
+
+    A callback query for the same button of the same message, or a message with the
+    same text, arriving within ``duplicate_window`` seconds of the previous one is
+    dropped as a double tap. Beyond that each user gets a token bucket; updates
+    that find it empty are dropped, with one warning per burst. State for users
+    whose bucket has refilled is forgotten once ``max_users`` are tracked.
+    """
+
+    def __init__(self, rate: float = USER_RATE, burst: float = USER_BURST,
+                 duplicate_window: float = DUPLICATE_WINDOW, max_users: int = MAX_USERS):
+        self.rate = rate
+        self.burst = burst
+        self.duplicate_window = duplicate_window
+        self.max_users = max_users
+        self._users: Dict[int, _UserState] = {}
+
+    def _user(self, user_id: int) -> _UserState:
+        user = self._users.get(user_id)
+        if user is None:
+            if len(self._users) >= self.max_users:
+                cutoff = time.monotonic() - self.duplicate_window
+                self._users = {key: value for key, value in self._users.items()
+                               if value.last_seen >= cutoff or not value.bucket.idle}
+            user = self._users[user_id] = _UserState(self.rate, self.burst)
+        return user
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        if isinstance(event, CallbackQuery):
+            key = ('callback', event.message.message_id if event.message else None, event.data)
+        elif isinstance(event, Message):
+            key = ('message', event.text)
+        else:
+            return await handler(event, data)
+        if event.from_user is None:
+            return await handler(event, data)
+
+        user = self._user(event.from_user.id)
+        now = time.monotonic()
+        duplicate = key == user.last_key and now - user.last_seen < self.duplicate_window
+        user.last_key = key
+        user.last_seen = now
+        if duplicate:
+            THROTTLED_UPDATES.inc('duplicate')
+            if isinstance(event, CallbackQuery):
+                await event.answer()
+            return None
+
+        if user.bucket.try_acquire():
+            user.warned = False
+            return await handler(event, data)
+
+        THROTTLED_UPDATES.inc('rate')
+        warn = not user.warned
+        user.warned = True
+        if warn:
+            logging.warning(f"Throttling user {event.from_user.id}")
+        if isinstance(event, CallbackQuery):
+            await event.answer(SLOW_DOWN if warn else None)
+        elif warn:
+            await event.answer(SLOW_DOWN)
+        return None
@@ -1,32 +1,112 @@
-import random
+import logging
+from typing import Optional
 from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
 import app.keyboards as kb
 import app.oxford_api as ox
+from app import settings
+from app import engine
+from app.engine import MAX_WRONG_GUESSES
+from app.daily import challenge
+from app.outbox import Outbox
+from app.word_selector import selector
+from app.game_state import (GameState, mask_letters, board_checksum, USED_DEFINITION, END_GAME, MADE_MISTAKE,
+                            GET_SCORE, SAVED_WORD, DAILY)
+
+
+def _flag(flag: int) -> property:
+    return property(lambda self: self.state.has(flag), lambda self, value: self.state.set(flag, value))
 
 
 class HangmanGame:
-    def __init__(self, user_name: str, chat_id: int, difficulty: str):
+    used_definition = _flag(USED_DEFINITION)
+    end_game = _flag(END_GAME)
+    made_mistake = _flag(MADE_MISTAKE)
+    get_score = _flag(GET_SCORE)
+    saved_word = _flag(SAVED_WORD)
+    daily = _flag(DAILY)
+
+    def __init__(self, user_name: str, chat_id: int, difficulty: str, state: Optional[GameState] = None):
         self.name = user_name
         self.chat_id = chat_id
-        self.difficulty = difficulty
-        self.word = random.choice(self.load_words(difficulty))
-        self.guessed_letters = set()
-        self.wrong_guessed_letters = set()
-        self.wrong_guesses = 0
-        self.max_wrong_guesses = {'easy': 8, 'medium': 7, 'hard': 6}[difficulty]
-        self.hints_used = 0
-        self.used_definition = False
-        self.end_game = False
-        self.made_mistake = False
-        self.get_score = False
-        self.saved_word = False
+        self.state = state or GameState.new(difficulty)
+        self.outbox = Outbox(chat_id)
+        self.edit_board = settings.BOARD_MODE == 'edit'
+
+    @classmethod
+    async def create(cls, user_name: str, chat_id: int, difficulty: str) -> 'HangmanGame':
+        """Start a game with a word the player has not had yet."""
+        state = GameState.new(difficulty, await selector.pick(chat_id, difficulty))
+        return cls(user_name, chat_id, difficulty, state)
+
+    @classmethod
+    async def create_daily(cls, user_name: str, chat_id: int, difficulty: str) -> Optional['HangmanGame']:
+        """Start a game on today's word, or return ``None`` if the player already had it."""
+        state = await challenge.start(chat_id, difficulty)
+        return cls(user_name, chat_id, difficulty, state) if state else None
+
+    @classmethod
+    def from_state(cls, user_name: str, chat_id: int, state: GameState) -> 'HangmanGame':
+        return cls(user_name, chat_id, state.difficulty, state)
+
+    @property
+    def difficulty(self) -> str:
+        return self.state.difficulty
+
+    @property
+    def word(self) -> str:
+        return self.state.word
+
+    @property
+    def max_wrong_guesses(self) -> int:
+        return MAX_WRONG_GUESSES[self.state.difficulty]
+
+    @property
+    def wrong_guesses(self) -> int:
+        return self.state.wrong_guesses
+
+    @property
+    def hints_used(self) -> int:
+        return self.state.hints_used
+
+    async def flush(self, bot: Bot):
+        """Update the board and send everything else said during this turn as one message."""
+        if self.edit_board:
+            await self.update_board(bot)
+        await self.outbox.flush(bot)
+
+    def render_board(self) -> str:
+        board = self.get_display_word()
+        if self.state.wrong:
+            board += f"\nWrong letters: {' '.join(mask_letters(self.state.wrong))}"
+        return board
+
+    async def update_board(self, bot: Bot):
+        board = self.render_board()
+        board_check = board_checksum(board)
+        if self.state.board_message_id:
+            if board_check == self.state.board_check:
+                return
+            try:
+                await bot.edit_message_text(board, chat_id=self.chat_id, message_id=self.state.board_message_id)
+                self.state.board_check = board_check
+                return
+            except TelegramBadRequest as e:
+                if 'not modified' in e.message:
+                    self.state.board_check = board_check
+                    return
+                logging.warning(f"Could not edit the board in chat {self.chat_id}, sending a new one: {e}")
+        message = await bot.send_message(self.chat_id, board)
+        self.state.board_message_id = message.message_id
+        self.state.board_check = board_check
 
     async def start_game(self, bot: Bot):
-        await bot.send_message(self.chat_id, self.get_display_word())
-        await bot.send_message(self.chat_id, "Guess a letter:")
+        if not self.edit_board:
+            self.outbox.add(self.get_display_word())
+        self.outbox.add("Guess a letter:")
 
     def get_display_word(self) -> str:
-        return ' '.join([letter if letter in self.guessed_letters else '_' for letter in self.word])
+        return self.state.display_word()
 
     async def handle_guess(self, bot: Bot, data: str):
         self.made_mistake = False
@@ -42,28 +122,32 @@ class HangmanGame:
             await self.handle_word_guess(bot, data)
 
     async def handle_letter_guess(self, bot: Bot, letter: str):
-        if letter in self.guessed_letters:
-            await bot.send_message(self.chat_id, f"You already guessed the letter '{letter}'. Try again.")
-        elif letter in self.word:
-            self.guessed_letters.add(letter)
-            if self.is_word_guessed():
-                await self.handle_game_end(bot)
-            else:
-                await self.send_game_status(bot)
-        elif letter in self.wrong_guessed_letters:
-            await bot.send_message(self.chat_id, f"You already tried the letter '{letter}'. Try something else.")
-        else:
-            await self.record_wrong_guess(letter, bot)
+        await self.handle_outcome(bot, engine.guess_letter(self.state, letter), letter)
 
     async def handle_word_guess(self, bot: Bot, whole_word: str):
-        if whole_word == self.word:
-            self.guessed_letters.update(self.word)
+        await self.handle_outcome(bot, engine.guess_word(self.state, whole_word), whole_word)
+
+    async def handle_outcome(self, bot: Bot, outcome: str, guess: str):
+        if outcome == engine.NOT_A_LETTER:
+            self.outbox.add(f"'{guess}' is not a letter. Please send a letter from a to z.")
+        elif outcome == engine.ALREADY_GUESSED:
+            self.outbox.add(f"You already guessed the letter '{guess}'. Try again.")
+        elif outcome == engine.ALREADY_WRONG:
+            self.outbox.add(f"You already tried the letter '{guess}'. Try something else.")
+        elif outcome == engine.HIT:
+            await self.send_game_status(bot)
+        elif outcome == engine.WON:
             await self.handle_game_end(bot)
         else:
-            await self.record_wrong_guess(None, bot)
+            self.made_mistake = True
+            if outcome == engine.LOST:
+                await self.handle_game_end(bot)
+            else:
+                await self.send_wrong_guess_message(bot)
 
     async def send_game_status(self, bot: Bot):
-        await bot.send_message(self.chat_id, self.get_display_word())
+        if not self.edit_board:
+            self.outbox.add(self.get_display_word())
         if self.made_mistake:
             if not self.used_definition:
                 await self.suggesting_definition(bot)
@@ -72,95 +156,71 @@ class HangmanGame:
 
     async def send_wrong_guess_message(self, bot: Bot):
         remaining_guesses = self.max_wrong_guesses - self.wrong_guesses
-        await bot.send_message(self.chat_id, f"Wrong guess! You have {remaining_guesses} guesses left.")
+        self.outbox.add(f"Wrong guess! You have {remaining_guesses} guesses left.")
         await self.send_game_status(bot)
 
-    async def record_wrong_guess(self, letter: str, bot: Bot):
-        self.wrong_guesses += 1
-        self.made_mistake = True
-        if letter:
-            self.wrong_guessed_letters.add(letter)
-        if self.wrong_guesses >= self.max_wrong_guesses:
-            await self.handle_game_end(bot)
-        else:
-            await self.send_wrong_guess_message(bot)
-
     async def suggesting_definition(self, bot: Bot):
-        await bot.send_message(self.chat_id, 'Would you like definitions and examples of how the word is used?',
-                               reply_markup=kb.definitions)
+        self.outbox.add('Would you like definitions and examples of how the word is used?',
+                        reply_markup=kb.definitions)
 
     async def suggesting_hint(self, bot: Bot):
-        await bot.send_message(self.chat_id, 'Would you like a random letter in your word to be revealed?',
-                               reply_markup=kb.hint)
+        self.outbox.add('Would you like a random letter in your word to be revealed?',
+                        reply_markup=kb.hint)
 
     async def handle_game_end(self, bot: Bot):
         self.end_game = True
         if not self.get_score:
             from app.db import save_score
             points = self.calculate_points()
-            await save_score(self.chat_id, self.name, points)
+            # Daily results are saved in bulk, with their points, a few seconds later
+            if not (self.daily and await challenge.record(self.chat_id, self.name, self.state, points)):
+                await save_score(self.chat_id, self.name, points)
             self.get_score = True
 
         message = f"Congratulations! You've guessed the word: {self.word}\nWould you like to save this word in your database?" if self.is_word_guessed() else f"Game over! The word was: {self.word}\nWould you like to save this word in your database?"
-        await bot.send_message(self.chat_id, message, reply_markup=kb.word_database)
+        self.outbox.add(message, reply_markup=kb.word_database)
 
     async def reset_game_state(self):
-        self.__init__(self.name, self.chat_id, self.difficulty)
+        self.state = GameState.new(self.difficulty, await selector.pick(self.chat_id, self.difficulty))
 
     async def give_definition(self, bot: Bot):
-        result = await ox.get_data(self.word, True)
+        result = challenge.page(self.state) if self.daily else None
+        if result is None:
+            result = await ox.get_data(self.word, True)
         if result:
             self.used_definition = True
-            await bot.send_message(self.chat_id, 'Definitions:\n' + '\n'.join(
+            self.outbox.add('Definitions:\n' + '\n'.join(
                 f"{i + 1}) {definition}" for i, definition in enumerate(result['definitions'])))
             if result['examples']:
-                await bot.send_message(self.chat_id, 'Examples:\n' + '\n'.join(
+                self.outbox.add('Examples:\n' + '\n'.join(
                     f"{i + 1}) {example}" for i, example in enumerate(result['examples'])))
 
     async def give_hint(self, bot: Bot):
-        available_letters = [letter for letter in self.word if letter not in self.guessed_letters]
-        if available_letters:
-            hint_letter = random.choice(available_letters)
-            self.guessed_letters.add(hint_letter)
-            self.hints_used += 1
+        hint_letter = engine.hint(self.state)
+        if hint_letter:
             self.made_mistake = False
-            await bot.send_message(self.chat_id, f"Hint: The word contains the letter '{hint_letter}'.")
+            self.outbox.add(f"Hint: The word contains the letter '{hint_letter}'.")
             if self.is_word_guessed():
                 await self.send_game_status(bot)
                 await self.handle_game_end(bot)
             else:
                 await self.send_game_status(bot)
         else:
-            await bot.send_message(self.chat_id, "No hint available.")
+            self.outbox.add("No hint available.")
 
     async def add_word(self, bot: Bot):
         self.saved_word = True
         from app.db import save_word
         res = await save_word(self.chat_id, self.word)
         message = f"The word '{self.word}' was successfully saved" if res else f"The word '{self.word}' is already in the database"
-        await bot.send_message(self.chat_id, message)
+        self.outbox.add(message)
         await self.resetting_game(bot)
 
     async def resetting_game(self, bot: Bot):
-        await bot.send_message(self.chat_id, 'Would you like to play again?', reply_markup=kb.resetting)
+        self.outbox.add('Would you like to play again?', reply_markup=kb.resetting)
 
     def calculate_points(self) -> int:
-        if len(self.guessed_letters) == len(set(self.word)):
-            difficulty_multiplier = {'hard': 2, 'medium': 1.6, 'easy': 1.2}[self.difficulty]
-            hints_multiplier = {0: 1.5, 1: 1.2, 2: 1}[self.hints_used]
-            word_length_multiplier = 1.2 if len(set(self.word)) >= 3 else 1
-            points = round(10 * difficulty_multiplier * hints_multiplier * word_length_multiplier)
-        else:
-            difficulty_multiplier = {'hard': 1.2, 'medium': 1.5, 'easy': 2}[self.difficulty]
-            hints_multiplier = {0: 1, 1: 1.5, 2: 2}[self.hints_used]
-            word_length_multiplier = 1.2 if len(set(self.word)) <= 3 else 1
-            points = round(-10 * difficulty_multiplier * hints_multiplier * word_length_multiplier)
-        return points
-
-    def load_words(self, difficulty: str) -> list:
-        path = f'words_fold/{difficulty}.txt'
-        with open(path, 'r') as file:
-            return [line.split()[0].strip() for line in file if len(line.split()[0].strip()) >= 3]
+        return engine.points(self.state)
 
     def is_word_guessed(self) -> bool:
-        return all(letter in self.guessed_letters for letter in self.word)
+        return engine.is_won(self.state.info, self.state.guessed)
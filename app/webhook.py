@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import multiprocessing
+import signal
+from typing import Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
+
+import app.db as bd
+from app import settings
+from app.daily import challenge
+from app.metrics import metrics_view
+from app.multiplayer import groups
+from app.ratelimit import GLOBAL_RATE
+from app.word_selector import selector
+
+READY = web.AppKey('ready', dict)
+
+
+async def health(request: web.Request) -> web.Response:
+    return web.Response(text='ok')
+
+
+async def ready(request: web.Request) -> web.Response:
+    if request.app[READY]['ready']:
+        return web.Response(text='ready')
+    return web.Response(status=503, text='not ready')
+
+
+def build_app(dp: Dispatcher, bot: Bot, serve_metrics: bool = True) -> web.Application:
+    """aiohttp application serving the webhook plus /healthz, /readyz and, optionally, /metrics.
+
+    Updates are handled inside the request, so aiohttp's graceful shutdown waits for
+    in-flight updates before the dispatcher, storage and bot session are closed.
+    """
+    app = web.Application()
+    app[READY] = {'ready': False}
+    handler = SimpleRequestHandler(dispatcher=dp, bot=bot, handle_in_background=False,
+                                   secret_token=settings.WEBHOOK_SECRET)
+    # Not handler.register(): it closes the bot session in on_shutdown, before in-flight updates drain
+    app.router.add_post(settings.WEBHOOK_PATH, handler.handle)
+    app.router.add_get('/healthz', health)
+    app.router.add_get('/readyz', ready)
+    if serve_metrics:
+        app.router.add_get('/metrics', metrics_view)
+
+    async def on_startup(app: web.Application):
+        await dp.emit_startup(bot=bot, dispatcher=dp, app=app, **dp.workflow_data)
+        app[READY]['ready'] = True
+
+    async def on_shutdown(app: web.Application):
+        app[READY]['ready'] = False
+
+    async def on_cleanup(app: web.Application):
+        try:
+            await dp.emit_shutdown(bot=bot, dispatcher=dp, app=app, **dp.workflow_data)
+        finally:
+            await bot.session.close()
+
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+async def set_webhook(bot: Bot, dp: Dispatcher) -> None:
+    url = f"{settings.WEBHOOK_BASE_URL.rstrip('/')}{settings.WEBHOOK_PATH}"
+    await bot.set_webhook(url, secret_token=settings.WEBHOOK_SECRET,
+                          max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+                          allowed_updates=dp.resolve_used_update_types())
+    await bot.session.close()
+    logging.info(f"Webhook set to {url}")
+
+
+def serve(create_bot: Callable[..., Bot], create_dispatcher: Callable[[], Dispatcher], reuse_port: bool,
+          worker: int = 0, workers: int = 1) -> None:
+    dp = create_dispatcher()
+    global_rate = GLOBAL_RATE
+    if reuse_port:
+        # Each worker has its own send limiter, so they share Telegram's global limit between them
+        global_rate = GLOBAL_RATE / workers
+        # Another worker may have added to a player's word history since it was cached here
+        selector.max_cached = 0
+        # Other workers change scores too, so the in-memory leaderboards have to be reloaded now and then
+        bd.leaderboard.max_age = settings.LEADERBOARD_MAX_AGE
+        challenge.max_age = settings.LEADERBOARD_MAX_AGE
+        # A group's updates can reach any worker, but its game lives in one of them
+        groups.enabled = False
+        # Metrics are counted per process and the shared port reaches any worker, so each
+        # worker serves its own on METRICS_PORT + its index and Prometheus adds them up
+        dp['exporter'].port = settings.METRICS_PORT + worker if settings.METRICS_PORT else None
+    app = build_app(dp, create_bot(global_rate), serve_metrics=not reuse_port)
+    web.run_app(app, host=settings.WEB_HOST, port=settings.WEB_PORT, reuse_port=reuse_port,
+                shutdown_timeout=settings.SHUTDOWN_TIMEOUT, print=None)
+
+
+def run_webhook(create_bot: Callable[..., Bot], create_dispatcher: Callable[[], Dispatcher]) -> None:
+    """Register the webhook with Telegram and serve it from ``WEB_WORKERS`` processes.
+
+    Several workers need ``FSM_STORAGE = 'redis'`` for shared game state and per-user
+    locks; without it the bot runs a single worker. Group games are in-process only
+    and are switched off when there are several workers.
+    """
+    if settings.WEBHOOK_BASE_URL:
+        asyncio.run(set_webhook(create_bot(), create_dispatcher()))
+    else:
+        logging.warning('WEBHOOK_BASE_URL is not set, assuming the webhook is already registered')
+
+    workers = settings.WEB_WORKERS
+    if workers > 1 and settings.FSM_STORAGE != 'redis':
+        logging.error(f'WEB_WORKERS = {workers} needs FSM_STORAGE = "redis" to share games and per-user locks, '
+                      'running a single worker')
+        workers = 1
+    if workers <= 1:
+        serve(create_bot, create_dispatcher, reuse_port=False)
+        return
+
+    # Every worker binds the same port with SO_REUSEPORT and the kernel spreads connections between them
+    processes = [multiprocessing.Process(target=serve, args=(create_bot, create_dispatcher, True, i, workers),
+                                         name=f'webhook-{i}') for i in range(workers)]
+    for process in processes:
+        process.start()
+
+    def stop(signum, frame):
+        # SIGTERM makes each worker stop accepting, drain in-flight updates and clean up
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
@@ -0,0 +1,138 @@
+import random
+import re
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import app.db as bd
+from app.words import WordList, bank
+
+# Parts of speech that make good puzzles; function words ("pron.", "prep.", ...) rarely do
+POS_WEIGHTS = {'n': 1.0, 'v': 1.0, 'adj': 0.8, 'adv': 0.5}
+OTHER_POS_WEIGHT = 0.2
+LENGTH_WEIGHTS = {3: 0.5, 4: 0.8}  # longer words weigh 1
+MAX_TRIES = 32  # rejection-sampling draws before falling back to a scan of the unseen words
+MAX_CACHED_HISTORIES = 10000
+
+_POS = re.compile(r'\b(n|v|adj|adv|pron|prep|conj|det|exclam|number|modal)\b')
+
+
+def word_weight(word: str, tag: str) -> float:
+    parts = _POS.findall(tag)
+    pos_weight = max((POS_WEIGHTS.get(part, OTHER_POS_WEIGHT) for part in parts), default=OTHER_POS_WEIGHT)
+    return pos_weight * LENGTH_WEIGHTS.get(len(word), 1.0)
+
+
+def list_checksum(words: Sequence[str]) -> int:
+    return zlib.crc32('\n'.join(words).encode())
+
+
+class AliasTable:
+    """Walker's alias method: weighted sampling in O(1) after an O(n) build.
+
+    Only words with a positive weight are in the table, so rounding in the build
+    can never make an excluded word drawable.
+    """
+    __slots__ = ('word_list', 'check', 'weights', 'indexes', 'prob', 'alias')
+
+    def __init__(self, word_list: WordList):
+        self.word_list = word_list
+        self.check = list_checksum(word_list.words)
+        weights = []
+        seen_words = set()
+        for word, tag in zip(word_list.words, word_list.tags):
+            # Homonyms share a word; only the first entry is drawn so a player never gets it twice
+            weights.append(0.0 if word in seen_words else word_weight(word, tag))
+            seen_words.add(word)
+        self.weights = array('d', weights)
+
+        indexes = [i for i, weight in enumerate(weights) if weight > 0]
+        n = len(indexes)
+        total = sum(weights) or 1.0
+        prob = [weights[i] * n / total for i in indexes]
+        alias = [0] * n
+        small = [i for i, p in enumerate(prob) if p < 1]
+        large = [i for i, p in enumerate(prob) if p >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            alias[less] = more
+            prob[more] -= 1 - prob[less]
+            (small if prob[more] < 1 else large).append(more)
+        for i in small + large:
+            prob[i] = 1.0  # left over only through rounding, every one of them has weight
+        self.indexes = array('I', indexes)
+        self.prob = array('d', prob)
+        self.alias = array('I', alias)
+
+    def sample(self, rng: random.Random) -> int:
+        """Index into the word list of a word drawn by weight."""
+        i = rng.randrange(len(self.prob))
+        return self.indexes[i if rng.random() < self.prob[i] else self.alias[i]]
+
+
+class WordSelector:
+    """Picks words a player has not had yet, weighted by length and part of speech.
+
+    Each player's history is a bitset over word indices per difficulty, so a pick is
+    a few alias-table draws rejected against set bits. Histories are stored as blobs
+    in the database and the most recently used ones are kept in memory, unless
+    ``max_cached`` is 0 because other processes write them too. A history written
+    for a different version of a word list is discarded.
+    """
+
+    def __init__(self, max_cached: int = MAX_CACHED_HISTORIES, rng: Optional[random.Random] = None):
+        self.max_cached = max_cached
+        self.rng = rng or random.Random()
+        self._tables: Dict[str, AliasTable] = {}
+        self._histories: "OrderedDict[Tuple[int, str], Tuple[int, int]]" = OrderedDict()  # -> (list check, bits)
+
+    def table(self, difficulty: str) -> AliasTable:
+        word_list = bank.get(difficulty)
+        table = self._tables.get(difficulty)
+        if table is None or table.word_list is not word_list:
+            table = self._tables[difficulty] = AliasTable(word_list)
+        return table
+
+    async def _history(self, player_id: int, difficulty: str, check: int) -> int:
+        key = (player_id, difficulty)
+        cached = self._histories.get(key)
+        if cached is None:
+            row = await bd.get_word_history(player_id, difficulty)
+            cached = (row[0], int.from_bytes(row[1], 'little')) if row else (check, 0)
+        self._remember(key, cached)
+        return cached[1] if cached[0] == check else 0
+
+    def _remember(self, key: Tuple[int, str], value: Tuple[int, int]) -> None:
+        self._histories[key] = value
+        self._histories.move_to_end(key)
+        while len(self._histories) > self.max_cached:
+            self._histories.popitem(last=False)
+
+    def _choose(self, table: AliasTable, seen: int) -> Optional[int]:
+        for _ in range(MAX_TRIES):
+            index = table.sample(self.rng)
+            if not seen >> index & 1:
+                return index
+        unseen: List[int] = [i for i, weight in enumerate(table.weights) if weight and not seen >> i & 1]
+        if not unseen:
+            return None
+        return self.rng.choices(unseen, [table.weights[i] for i in unseen])[0]
+
+    async def pick(self, player_id: int, difficulty: str) -> int:
+        """Index into ``bank.get(difficulty).words`` of a word new to the player."""
+        table = self.table(difficulty)
+        seen = await self._history(player_id, difficulty, table.check)
+        index = self._choose(table, seen)
+        if index is None:
+            # Every word has been played, start over
+            seen = 0
+            index = self._choose(table, seen)
+        seen |= 1 << index
+        self._remember((player_id, difficulty), (table.check, seen))
+        await bd.save_word_history(player_id, difficulty, table.check,
+                                   seen.to_bytes((len(table.weights) + 7) // 8, 'little'))
+        return index
+
+
+selector = WordSelector()
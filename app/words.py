@@ -0,0 +1,125 @@
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+WORDS_DIR = 'words_fold'
+DIFFICULTIES = ('easy', 'medium', 'hard')
+MIN_WORD_LENGTH = 3
+CHECK_INTERVAL = 5.0  # seconds between mtime checks of the word files
+
+
+class WordList:
+    """Read-only snapshot of one difficulty file.
+
+    ``words`` and ``tags`` are parallel tuples: ``tags[i]`` holds the rest of the
+    source line after ``words[i]`` (part of speech and sense, e.g. ``"(river) n."``).
+    """
+    __slots__ = ('difficulty', 'words', 'tags', 'mtime')
+
+    def __init__(self, difficulty: str, words: Tuple[str, ...], tags: Tuple[str, ...], mtime: float):
+        self.difficulty = difficulty
+        self.words = words
+        self.tags = tags
+        self.mtime = mtime
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+
+def parse_words(path: str, difficulty: str) -> WordList:
+    mtime = os.stat(path).st_mtime
+    words = []
+    tags = []
+    with open(path, 'r') as file:
+        for line in file:
+            parts = line.split(maxsplit=1)
+            if not parts:
+                continue
+            if parts[0].isdigit():
+                # The sense number of a wrapped entry ("close" / "2 adv.") lands on its own line
+                if tags and not tags[-1] and len(parts) > 1:
+                    tags[-1] = parts[1].strip()
+                continue
+            # Homonyms are numbered in the source lists ("ring1", "ring2")
+            word = parts[0].rstrip('0123456789').lower()
+            if len(word) < MIN_WORD_LENGTH:
+                continue
+            words.append(word)
+            tags.append(parts[1].strip() if len(parts) > 1 else '')
+    return WordList(difficulty, tuple(words), tuple(tags), mtime)
+
+
+class WordBank:
+    """Word lists for every difficulty, loaded on first use and shared by all games.
+
+    The bank is swapped as a whole when a file changes on disk, so readers always
+    see a consistent set of lists without locking.
+    """
+
+    def __init__(self, directory: str = WORDS_DIR, check_interval: float = CHECK_INTERVAL):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._lists: Mapping[str, WordList] = MappingProxyType({})
+        self._loaded = False
+        self._checked_at = 0.0
+        self._reload_lock = threading.Lock()
+
+    def path(self, difficulty: str) -> str:
+        return os.path.join(self.directory, f'{difficulty}.txt')
+
+    def load(self) -> None:
+        lists: Dict[str, WordList] = {}
+        for difficulty in DIFFICULTIES:
+            lists[difficulty] = parse_words(self.path(difficulty), difficulty)
+        self._lists = MappingProxyType(lists)
+        self._loaded = True
+        self._checked_at = time.monotonic()
+
+    def ensure_loaded(self) -> None:
+        if not self._loaded:
+            with self._reload_lock:
+                if not self._loaded:
+                    self.load()
+
+    def refresh(self) -> bool:
+        """Reload the lists whose files changed since they were read."""
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            self._checked_at = time.monotonic()
+            current = self._lists
+            changed: Optional[Dict[str, WordList]] = None
+            for difficulty, word_list in current.items():
+                try:
+                    mtime = os.stat(self.path(difficulty)).st_mtime
+                    if mtime == word_list.mtime:
+                        continue
+                    fresh = parse_words(self.path(difficulty), difficulty)
+                except OSError as e:
+                    logging.error(f"Failed to reload word list '{difficulty}': {e}")
+                    continue
+                if not fresh.words:
+                    logging.error(f"Word list '{difficulty}' is empty, keeping the previous one")
+                    continue
+                if changed is None:
+                    changed = dict(current)
+                changed[difficulty] = fresh
+                logging.info(f"Reloaded word list '{difficulty}' ({len(fresh)} words)")
+            if changed is not None:
+                self._lists = MappingProxyType(changed)
+            return changed is not None
+        finally:
+            self._reload_lock.release()
+
+    def get(self, difficulty: str) -> WordList:
+        if not self._loaded:
+            self.ensure_loaded()
+        elif time.monotonic() - self._checked_at >= self.check_interval:
+            self.refresh()
+        return self._lists[difficulty]
+
+
+bank = WordBank()
@@ -0,0 +1,92 @@
+"""Microbenchmarks for the per-guess hot path.
+
+Needs pytest-benchmark; the file name keeps it out of the default test run:
+
+    python -m pytest benchmarks/bench_engine.py --benchmark-only
+"""
+import random
+
+import pytest
+
+from app import engine
+from app.game_state import GameState
+from app.words import bank
+
+WORD = 'administrative'
+ROUNDS = 20000
+
+
+@pytest.fixture
+def state() -> GameState:
+    words = bank.get('hard').words
+    assert WORD in words, f"{WORD!r} is not in the hard word list"
+    return GameState('hard', words.index(WORD), WORD)
+
+
+def _replay(state: GameState) -> GameState:
+    """A fresh copy, so every round starts from the same position."""
+    return GameState(state.difficulty, state.word_index, state.word)
+
+
+def _bench_fresh(benchmark, run, state: GameState):
+    """Time ``run(game)`` on a fresh copy of ``state``, made outside the timed part."""
+    return benchmark.pedantic(run, setup=lambda: ((_replay(state),), {}), rounds=ROUNDS, iterations=1)
+
+
+def test_guess_hit(benchmark, state):
+    def run(game):
+        return engine.guess_letter(game, state.word[0])
+
+    assert _bench_fresh(benchmark, run, state) in (engine.HIT, engine.WON)
+
+
+def test_guess_miss(benchmark, state):
+    missing = next(letter for letter in 'zqxjkvbpygfwmucldrhsnioate' if letter not in state.word)
+
+    def run(game):
+        return engine.guess_letter(game, missing)
+
+    assert _bench_fresh(benchmark, run, state) == engine.MISS
+
+
+def test_full_game(benchmark, state):
+    def run(game):
+        for letter in 'etaoinshrdlcumwfgypbvkjxqz':
+            if engine.guess_letter(game, letter) in (engine.WON, engine.LOST):
+                break
+        return game
+
+    _bench_fresh(benchmark, run, state)
+
+
+def test_hint(benchmark, state):
+    rng = random.Random(0)
+
+    def run(game):
+        return engine.hint(game, rng)
+
+    assert _bench_fresh(benchmark, run, state) in state.word
+
+
+def test_render(benchmark, state):
+    def run(game):
+        game.display_word()
+        for letter in 'aeiou':
+            engine.guess_letter(game, letter)
+            game.display_word()
+        return game.display_word()
+
+    assert '_' in _bench_fresh(benchmark, run, state) or engine.is_won(state.info, state.info.letters)
+
+
+def test_points(benchmark, state):
+    game = _replay(state)
+    game.reveal(state.info.letters)
+    assert benchmark(engine.points, game) > 0
+
+
+def test_encode_decode(benchmark, state):
+    def run():
+        return GameState.decode(state.encode())
+
+    assert benchmark(run).word == state.word
@@ -0,0 +1,268 @@
+"""Replay synthetic players against the real dispatcher and router.
+
+Every player runs /start, /play, picks a difficulty, guesses letters, takes the
+definition and hint prompts when offered, saves the word and plays again. Bot API
+calls are answered in-process by a stub session and definitions come from a local
+stub dictionary server, so the numbers measure the bot itself.
+
+    python -m benchmarks.load_test --players 2000 --rounds 2
+    python -m benchmarks.load_test --players 2000 --rounds 1 --daily
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage, SimpleEventIsolation
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import Update
+from aiohttp import web
+
+import app.db as bd
+import app.oxford_api as ox
+from app import metrics, settings
+from app.daily import challenge
+from app.definition_cache import DefinitionCache
+from app.handlers import router
+from app.outbox import RateLimitMiddleware
+from app.storage import SQLiteStorage
+
+TOKEN = '123456:load-test'
+LETTERS = 'etaoinshrdlcumwfgypbvkjxqz'  # English letter frequency order
+DIFFICULTIES = ('easy', 'medium', 'hard')
+LATENCY = web.AppKey('latency', float)
+
+
+class StubSession(BaseSession):
+    """Answers Bot API calls in-process and remembers the last prompt shown in each chat."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.prompts: Dict[int, str] = {}
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[TelegramType],
+                           timeout: Optional[int] = None) -> TelegramType:
+        name = type(method).__name__
+        self.calls[name] += 1
+        chat_id = getattr(method, 'chat_id', None)
+        if name == 'GetMe':
+            result: Any = {'id': 1, 'is_bot': True, 'first_name': 'Hangman', 'username': 'hangman_bot'}
+        elif name in ('SendMessage', 'EditMessageText', 'EditMessageReplyMarkup'):
+            markup = getattr(method, 'reply_markup', None)
+            if name == 'SendMessage' and markup is not None:
+                self.prompts[chat_id] = markup.inline_keyboard[0][0].callback_data
+            message_id = getattr(method, 'message_id', None) or next(self._message_ids)
+            result = {'message_id': message_id, 'date': int(time.time()),
+                      'chat': {'id': chat_id, 'type': 'private'}, 'text': getattr(method, 'text', None) or ''}
+        else:
+            result = True
+        response = self.check_response(bot, method, 200, json.dumps({'ok': True, 'result': result}))
+        return response.result
+
+    async def stream_content(self, url: str, headers: Optional[Dict[str, Any]] = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b''
+
+    async def close(self) -> None:
+        pass
+
+
+async def dictionary_page(request: web.Request) -> web.Response:
+    word = request.match_info['word']
+    await asyncio.sleep(request.app[LATENCY])
+    body = ''.join(f'<span class="def">{word} meaning number {i}</span>'
+                   f'<span class="x">an example that uses {word} ({i})</span>' for i in range(4))
+    return web.Response(text=f'<html><body>{body}</body></html>', content_type='text/html')
+
+
+async def start_dictionary(latency: float) -> web.AppRunner:
+    app = web.Application()
+    app[LATENCY] = latency
+    app.router.add_get('/{word}', dictionary_page)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner
+
+
+class Player:
+    """One synthetic user; reacts to the prompts the bot shows like a cooperative human."""
+
+    def __init__(self, user_id: int, bench: 'LoadTest'):
+        self.user_id = user_id
+        self.bench = bench
+        self.update_ids = itertools.count(user_id * 1000)
+        self.user = {'id': user_id, 'is_bot': False, 'first_name': f'Player{user_id}'}
+        self.chat = {'id': user_id, 'type': 'private', 'first_name': f'Player{user_id}'}
+
+    def message(self, text: str) -> Update:
+        update_id = next(self.update_ids)
+        return Update.model_validate({'update_id': update_id, 'message': {
+            'message_id': update_id, 'date': int(time.time()), 'chat': self.chat, 'from': self.user, 'text': text}})
+
+    def callback(self, data: str) -> Update:
+        update_id = next(self.update_ids)
+        return Update.model_validate({'update_id': update_id, 'callback_query': {
+            'id': str(update_id), 'chat_instance': str(self.user_id), 'data': data, 'from': self.user,
+            'message': {'message_id': update_id, 'date': int(time.time()), 'chat': self.chat, 'text': 'prompt'}}})
+
+    def take_prompt(self) -> Optional[str]:
+        return self.bench.session.prompts.pop(self.user_id, None)
+
+    async def start(self) -> None:
+        await self.bench.feed(self.message('/start'))
+        if self.bench.daily:
+            await self.bench.feed(self.message('/daily'))
+            self.take_prompt()
+            await self.bench.feed(self.callback(f'daily_{random.choice(DIFFICULTIES)}'))
+            return
+        await self.bench.feed(self.message('/play'))
+        self.take_prompt()
+        await self.bench.feed(self.callback(random.choice(DIFFICULTIES)))
+
+    async def play_round(self) -> None:
+        letters = iter(LETTERS)
+        while True:
+            prompt = self.take_prompt()
+            if prompt in ('get_definition', 'get_hint', 'word_to_database'):
+                await self.bench.feed(self.callback(prompt))
+                continue
+            if prompt == 'play_again':
+                return
+            letter = next(letters, None)
+            if letter is None:
+                return
+            await self.bench.feed(self.message(letter))
+
+    async def run(self, rounds: int) -> None:
+        await self.start()
+        for round_number in range(rounds):
+            await self.play_round()
+            if round_number < rounds - 1:
+                await self.bench.feed(self.callback('play_again'))
+        self.bench.games += rounds
+
+
+class LoadTest:
+    def __init__(self, dp: Dispatcher, bot: Bot, session: StubSession, daily: bool = False):
+        self.dp = dp
+        self.bot = bot
+        self.session = session
+        self.daily = daily  # first games are the daily words instead of fresh ones
+        self.latencies: List[float] = []
+        self.games = 0
+
+    async def feed(self, update: Update) -> None:
+        started = time.perf_counter()
+        await self.dp.feed_update(self.bot, update)
+        self.latencies.append(time.perf_counter() - started)
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def create_storage(kind: str, directory: str) -> BaseStorage:
+    if kind == 'sqlite':
+        return SQLiteStorage(os.path.join(directory, 'fsm.db'), settings.FSM_TTL, settings.FSM_FLUSH_INTERVAL)
+    return MemoryStorage()
+
+
+async def measure_memory(bench: LoadTest, games: int, first_id: int) -> float:
+    """Bytes held per game that has been started and is waiting for a guess."""
+    players = [Player(first_id + i, bench) for i in range(games)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for player in players:
+        await player.start()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / games
+
+
+async def run(args: argparse.Namespace) -> None:
+    random.seed(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        bd.db = bd.Database(os.path.join(directory, 'hangman.db'))
+        ox.cache = DefinitionCache(os.path.join(directory, 'definitions.db'))
+        dictionary = await start_dictionary(args.dictionary_latency)
+        port = dictionary.addresses[0][1]
+        ox.client = ox.DictionaryClient(base_url=f'http://127.0.0.1:{port}/')
+
+        session = StubSession()
+        if args.rate_limits:
+            session.middleware(RateLimitMiddleware())
+        bot = Bot(TOKEN, session=session)
+        storage = create_storage(args.storage, directory)
+        dp = Dispatcher(storage=storage, events_isolation=SimpleEventIsolation())
+        dp.include_router(router)
+        bench = LoadTest(dp, bot, session, args.daily)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(Player(i + 1, bench).run(args.rounds) for i in range(args.players)))
+        elapsed = time.perf_counter() - started
+        latencies = bench.latencies
+        summary = metrics.summary()
+        writes = {op: sum(counts) for (op, kind), (counts, _) in metrics.DB_LATENCY.values.items() if kind == 'write'}
+
+        bench.latencies = []
+        bench.daily = False
+        memory = await measure_memory(bench, args.memory_games, args.players + 1)
+
+        await challenge.close()
+        await storage.close()
+        await ox.client.close()
+        ox.cache.close()
+        await bd.db.close()
+        await dictionary.cleanup()
+
+    updates = len(latencies)
+    print(f"players:          {args.players} x {args.rounds} rounds ({args.storage} storage, "
+          f"rate limits {'on' if args.rate_limits else 'off'}{', daily words first' if args.daily else ''})")
+    print(f"updates:          {updates} in {elapsed:.2f}s = {updates / elapsed:.0f} updates/s")
+    print(f"games:            {bench.games} = {bench.games / elapsed:.0f} games/s")
+    print(f"latency p50/p99:  {percentile(latencies, 0.5) * 1000:.2f} / "
+          f"{percentile(latencies, 0.99) * 1000:.2f} ms")
+    print(f"memory per game:  {memory / 1024:.1f} KiB")
+    print(f"bot api calls:    {dict(session.calls)}")
+    print(f"dictionary:       {summary['cache']}")
+    print(f"database writes:  {writes}")
+    print('per handler p50/p99 (bucket upper bounds):')
+    for name, stats in sorted(summary['handlers'].items()):
+        print(f"  {name:28} {stats['count']:>7}  {stats['p50'] * 1000:g} / {stats['p99'] * 1000:g} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=2000, help='concurrent synthetic players')
+    parser.add_argument('--rounds', type=int, default=2, help='games each player plays')
+    parser.add_argument('--storage', choices=('sqlite', 'memory'), default='sqlite', help='FSM storage to use')
+    parser.add_argument('--daily', action='store_true', help="play today's daily words in the first round")
+    parser.add_argument('--rate-limits', action='store_true', help="apply Telegram's flood limits to the stub")
+    parser.add_argument('--dictionary-latency', type=float, default=0.05,
+                        help='seconds the stub dictionary takes per page')
+    parser.add_argument('--memory-games', type=int, default=500, help='games started while tracing memory')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Cold start to first handled update, measured in fresh interpreters.
+
+Each run imports the bot, builds the dispatcher, runs the startup hooks and feeds
+one /start update through a stub Bot session, timing every phase.
+
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PHASES = ('import', 'dispatcher', 'startup', 'first_update', 'total')
+
+CHILD = '''
+import asyncio, json, os, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+import app.db as bd
+from app import settings
+from benchmarks.load_test import Player, LoadTest, StubSession, TOKEN
+from aiogram import Bot
+
+directory = sys.argv[1]
+settings.FSM_STORAGE = 'memory'
+settings.LOG_FILE = os.path.join(directory, 'logs.txt')
+bd.db = bd.Database(os.path.join(directory, 'hangman.db'))
+
+
+async def run():
+    helpers_done = time.perf_counter()
+    dp = main.create_dispatcher()
+    built = time.perf_counter()
+    session = StubSession()
+    bot = Bot(TOKEN, session=session)
+    await dp.emit_startup(bot=bot, **dp.workflow_data)
+    ready = time.perf_counter()
+    bench = LoadTest(dp, bot, session)
+    await bench.feed(Player(1, bench).message('/start'))
+    handled = time.perf_counter()
+    await dp.emit_shutdown(bot=bot, **dp.workflow_data)
+    return {
+        'import': imported - started,
+        'dispatcher': built - helpers_done,
+        'startup': ready - built,
+        'first_update': handled - ready,
+        'total': (imported - started) + (handled - helpers_done),
+    }
+
+print(json.dumps(asyncio.run(run())))
+'''
+
+
+def run_once(importtime: bool = False) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', CHILD, directory]
+        result = subprocess.run(command, capture_output=True, text=True, check=True)
+    if importtime:
+        report_imports(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def report_imports(stderr: str, top: int = 15) -> None:
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, module = line[len('import time:'):].split('|')
+        rows.append((int(own), int(cumulative), module.strip()))
+    print('slowest imports by own time:')
+    for own, cumulative, module in sorted(rows, reverse=True)[:top]:
+        print(f'  {module:40} {own / 1000:8.1f} ms  (with dependencies {cumulative / 1000:.1f} ms)')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to start')
+    parser.add_argument('--importtime', action='store_true', help='also list the slowest imports of the first run')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    runs = [run_once(args.importtime and i == 0) for i in range(args.runs)]
+    for phase in PHASES:
+        values = [run[phase] * 1000 for run in runs]
+        print(f'{phase:13} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms')
+    print(f'{args.runs} runs in {time.perf_counter() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
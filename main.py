@@ -1,22 +1,40 @@
 import asyncio
-from aiogram import Bot, Dispatcher
+from aiogram import Dispatcher
 from app.handlers import router
+from app import lifecycle, settings
+from app.bot import create_bot
+from app.server_logs import setup_logging
+from app.storage import create_events_isolation, create_storage
+from app.throttling import ThrottlingMiddleware
+from app.webhook import run_webhook
 import logging
-from config import TOKEN
 
-logging.basicConfig(level=logging.INFO, filename='logs.txt', filemode='a',
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+def create_dispatcher() -> Dispatcher:
+    storage = create_storage()
+    # Games are loaded from and saved back to FSM data, so a user's updates must not interleave
+    dp = Dispatcher(storage=storage, events_isolation=create_events_isolation(storage))
+    throttling = ThrottlingMiddleware(settings.THROTTLE_RATE, settings.THROTTLE_BURST, settings.DUPLICATE_WINDOW)
+    dp.message.outer_middleware(throttling)
+    dp.callback_query.outer_middleware(throttling)
+    dp.include_router(router)
+    lifecycle.setup(dp)
+    return dp
 
 
 async def main():
-    bot = Bot(token=TOKEN)
-    dp = Dispatcher()
-    dp.include_router(router)
+    bot = create_bot()
+    dp = create_dispatcher()
     await dp.start_polling(bot)
 
 
 if __name__ == '__main__':
+    setup_logging(settings.LOG_FILE, settings.LOG_LEVEL, settings.LOG_MAX_BYTES, settings.LOG_ROTATE_INTERVAL,
+                  settings.LOG_BACKUPS, settings.LOG_GUESS_SAMPLE_RATE)
     try:
-        asyncio.run(main())
+        if settings.BOT_MODE == 'webhook':
+            run_webhook(create_bot, create_dispatcher)
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         logging.info('Ctrl+C pressed. Stopping.')
@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import logging
+import time
+from typing import List
+
+import aiohttp
+
+from app.definition_cache import DefinitionCache
+from app.oxford_api import BASE_URL, DictionaryClient
+from app.words import DIFFICULTIES, bank
+
+CONCURRENCY = 4
+REQUESTS_PER_SECOND = 2.0
+MAX_RETRIES = 3
+RETRY_DELAY = 5.0  # seconds, doubled on every retry
+
+
+class RateLimiter:
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            if self._next > now:
+                await asyncio.sleep(self._next - now)
+                now = self._next
+            self._next = now + self.interval
+
+
+def all_words() -> List[str]:
+    return sorted({word for difficulty in DIFFICULTIES for word in bank.get(difficulty).words})
+
+
+async def fetch_word(word: str, client: DictionaryClient, cache: DefinitionCache, limiter: RateLimiter) -> bool:
+    delay = RETRY_DELAY
+    for attempt in range(MAX_RETRIES + 1):
+        await limiter.wait()
+        try:
+            page = await client.fetch(word)
+        except aiohttp.ClientResponseError as e:
+            if e.status not in (429, 500, 502, 503, 504) or attempt == MAX_RETRIES:
+                logging.error(f"Failed to fetch '{word}': {e}")
+                return False
+            logging.warning(f"Got {e.status} for '{word}', retrying in {delay:.0f}s")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if attempt == MAX_RETRIES:
+                logging.error(f"Failed to fetch '{word}': {e}")
+                return False
+            logging.warning(f"Error fetching '{word}': {e}, retrying in {delay:.0f}s")
+        else:
+            await cache.put(word, page)
+            return True
+        await asyncio.sleep(delay)
+        delay *= 2
+    return False
+
+
+async def prefetch(base_url: str = BASE_URL, db_path: str = None, concurrency: int = CONCURRENCY,
+                   rate: float = REQUESTS_PER_SECOND) -> int:
+    cache = DefinitionCache(db_path) if db_path else DefinitionCache()
+    client = DictionaryClient(base_url=base_url, max_concurrent=concurrency)
+    limiter = RateLimiter(rate)
+
+    # Anything already stored and fresh was fetched by an earlier (possibly interrupted) run
+    done = await cache.fresh_words()
+    queue: asyncio.Queue = asyncio.Queue()
+    for word in all_words():
+        if word not in done:
+            queue.put_nowait(word)
+    total = queue.qsize()
+    logging.info(f"Prefetching {total} words ({len(done)} already cached)")
+
+    fetched = 0
+
+    async def worker():
+        nonlocal fetched
+        while True:
+            try:
+                word = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            if await fetch_word(word, client, cache, limiter):
+                fetched += 1
+                if fetched % 100 == 0:
+                    logging.info(f"Prefetched {fetched}/{total} words")
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        await client.close()
+        cache.close()
+    logging.info(f"Prefetched {fetched}/{total} words")
+    return fetched
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Warm the definitions cache for every word in words_fold.')
+    parser.add_argument('--base-url', default=BASE_URL, help='dictionary URL prefix the word is appended to')
+    parser.add_argument('--db', default=None, help='path of the definitions store')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND, help='requests per second')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args = parse_args()
+    try:
+        asyncio.run(prefetch(args.base_url, args.db, args.concurrency, args.rate))
+    except KeyboardInterrupt:
+        logging.info('Interrupted, rerun to resume.')
@@ -1,9 +1,10 @@
 import asyncio
 import datetime
 import logging
-import sqlite3
-from aiogram import Bot
-from config import TOKEN
+import app.db as bd
+from app import settings
+from app.bot import create_bot
+from app.broadcast import Broadcaster
 
 
 def get_summer_progress():
@@ -23,29 +24,18 @@ def get_summer_progress():
     return f"{progress_percentage:.2f}% of the summer has already passed. Spend your time wisely :)"
 
 
-def fetch_user_ids():
-    logging.info("Fetching user ids...")
-    conn = sqlite3.connect('hangman.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT player_id FROM scores')
-    user_ids = cursor.fetchall()
-    conn.close()
-    return [user_id[0] for user_id in user_ids]
-
-
 async def send_summer_progress():
-    bot = Bot(token=TOKEN)
-    user_ids = fetch_user_ids()
+    bot = create_bot(settings.BROADCAST_RATE)
     message = get_summer_progress()
+    year, week, _ = datetime.date.today().isocalendar()
 
-    for user_id in user_ids:
-        try:
-            await bot.send_message(user_id, message)
-        except Exception as e:
-            logging.error(f"Failed to send message to {user_id}: {e}")
-
-    await bot.session.close()
+    try:
+        await Broadcaster(bot, job=f'summer-progress-{year}-W{week:02d}').run(message)
+    finally:
+        await bot.session.close()
+        await bd.db.close()
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     asyncio.run(send_summer_progress())